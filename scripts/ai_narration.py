@@ -35,8 +35,20 @@ def get_google_api_key():
 ELEVEN_VOICE_ID = "2VUqK4PEdMj16L6xTN4J"
 ELEVEN_MODEL_ID = "eleven_multilingual_v2"
 
+# Idiomas de narración para las variantes (build_short.py --languages). El guion se escribe
+# en "es" con el prompt de siempre; para el resto se pide el mismo tono en ese idioma.
+# voice_id: voz de ElevenLabs (el modelo multilingüe lee todos); Voxtral clona VOICE_REFERENCE.
+LANGUAGES = {
+    "es": {"name": "español de España", "voice_id": ELEVEN_VOICE_ID},
+    "en": {"name": "inglés (neutro, sin acento marcado)", "voice_id": ELEVEN_VOICE_ID},
+    "pt": {"name": "portugués de Brasil", "voice_id": ELEVEN_VOICE_ID},
+    "it": {"name": "italiano", "voice_id": ELEVEN_VOICE_ID},
+}
+DEFAULT_LANGUAGE = "es"
+
 # --- GENERACIÓN DE GUION (GEMINI) ---
-def _generate_narration_parts(sel: dict, model=GEMINI_MODEL, min_words=55, max_words=65) -> tuple[str, str] | None:
+def _generate_narration_parts(sel: dict, model=GEMINI_MODEL, min_words=55, max_words=65,
+                              language: str = DEFAULT_LANGUAGE) -> tuple[str, str] | None:
     
     # Datos
     title = sel.get("titulo")
@@ -96,6 +108,13 @@ def _generate_narration_parts(sel: dict, model=GEMINI_MODEL, min_words=55, max_w
     
     OUTPUT: Texto Gancho | Texto Meollo
     """
+    if language != DEFAULT_LANGUAGE:
+        lang_name = LANGUAGES.get(language, {}).get("name", language)
+        prompt += f"""
+    **IDIOMA DE SALIDA: {lang_name.upper()}.** Escribe el guion entero en {lang_name}, con el mismo
+    humor y la misma estructura, como lo contaría un nativo gamberro (nada de traducción literal
+    ni de expresiones españolas). Mismo límite de palabras y el mismo separador "|".
+    """
 
     try:
         api_key = get_google_api_key()
@@ -144,7 +163,7 @@ VOICE_REFERENCE = CONFIG_DIR / "voice_reference.mp3"  # En config/ para sobreviv
 VOXTRAL_MODEL   = "voxtral-mini-tts-2603"
 
 # --- SÍNTESIS VOXTRAL (Mistral) ---
-def _synthesize_voxtral(hook: str, body: str, tmdb_id: str) -> Path | None:
+def _synthesize_voxtral(hook: str, body: str, tmdb_id: str, variant: str = "") -> Path | None:
     try:
         from mistralai.client import Mistral
         import base64
@@ -174,8 +193,8 @@ def _synthesize_voxtral(hook: str, body: str, tmdb_id: str) -> Path | None:
             response_format="mp3",
         )
 
-        temp_mp3  = NARRATION_DIR / f"{tmdb_id}_raw.mp3"
-        final_mp3 = NARRATION_DIR / f"{tmdb_id}_narration.mp3"
+        temp_mp3  = NARRATION_DIR / f"{tmdb_id}{variant}_raw.mp3"
+        final_mp3 = NARRATION_DIR / f"{tmdb_id}{variant}_narration.mp3"
 
         temp_mp3.write_bytes(base64.b64decode(response.audio_data))
 
@@ -197,7 +216,8 @@ def _synthesize_voxtral(hook: str, body: str, tmdb_id: str) -> Path | None:
 
 
 # --- SÍNTESIS ELEVENLABS (fallback) ---
-def _synthesize_elevenlabs(hook: str, body: str, tmdb_id: str) -> Path | None:
+def _synthesize_elevenlabs(hook: str, body: str, tmdb_id: str, variant: str = "",
+                           voice_id: str = ELEVEN_VOICE_ID) -> Path | None:
     try:
         api_key_path = CONFIG_DIR / "elevenlabs_api_key.txt"
         if not api_key_path.exists():
@@ -209,7 +229,7 @@ def _synthesize_elevenlabs(hook: str, body: str, tmdb_id: str) -> Path | None:
         safe_body = _clean_text_for_eleven(body)
         full_text = f"{safe_hook} ... {safe_body}"
 
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/{ELEVEN_VOICE_ID}"
+        url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
         headers = {"xi-api-key": api_key, "Content-Type": "application/json"}
         payload = {
             "text": full_text,
@@ -226,8 +246,8 @@ def _synthesize_elevenlabs(hook: str, body: str, tmdb_id: str) -> Path | None:
         response = requests.post(url, json=payload, headers=headers)
 
         if response.status_code == 200:
-            temp_wav  = NARRATION_DIR / f"{tmdb_id}_raw.mp3"
-            final_wav = NARRATION_DIR / f"{tmdb_id}_narration.mp3"
+            temp_wav  = NARRATION_DIR / f"{tmdb_id}{variant}_raw.mp3"
+            final_wav = NARRATION_DIR / f"{tmdb_id}{variant}_narration.mp3"
 
             with open(temp_wav, "wb") as f:
                 f.write(response.content)
@@ -252,28 +272,36 @@ def _synthesize_elevenlabs(hook: str, body: str, tmdb_id: str) -> Path | None:
         return None
 
 
-def _synthesize(hook: str, body: str, tmdb_id: str) -> Path | None:
+def _synthesize(hook: str, body: str, tmdb_id: str, variant: str = "",
+                voice_id: str = ELEVEN_VOICE_ID) -> Path | None:
     """Intenta Voxtral primero, ElevenLabs como fallback."""
-    voice_path = _synthesize_voxtral(hook, body, tmdb_id)
+    voice_path = _synthesize_voxtral(hook, body, tmdb_id, variant)
     if voice_path:
         return voice_path
     logging.warning("⚠️ Voxtral falló, intentando ElevenLabs como fallback...")
-    return _synthesize_elevenlabs(hook, body, tmdb_id)
-
+    return _synthesize_elevenlabs(hook, body, tmdb_id, variant, voice_id)
 
-def main():
-    if not (TMP_DIR / "next_release.json").exists(): return None
-    sel = json.loads((TMP_DIR / "next_release.json").read_text(encoding="utf-8"))
 
-    hook, body = _generate_narration_parts(sel)
-    if not hook: return None
+def narrate(sel: dict, language: str = DEFAULT_LANGUAGE, voice_id: str | None = None):
+    """Guion + audio en `language`. Devuelve (texto, ruta) o (None, None)."""
+    hook, body = _generate_narration_parts(sel, language=language) or (None, None)
+    if not hook: return None, None
 
-    voice_path = _synthesize(hook, body, str(sel.get("tmdb_id")))
+    # El idioma por defecto conserva los nombres de siempre (<id>_narration.mp3)
+    variant = "" if language == DEFAULT_LANGUAGE else f"_{language}"
+    voice_id = voice_id or LANGUAGES.get(language, {}).get("voice_id", ELEVEN_VOICE_ID)
+    voice_path = _synthesize(hook, body, str(sel.get("tmdb_id")), variant, voice_id)
 
     if voice_path:
         return f"{hook} {body}", voice_path
 
     return None, None
 
+
+def main():
+    if not (TMP_DIR / "next_release.json").exists(): return None
+    sel = json.loads((TMP_DIR / "next_release.json").read_text(encoding="utf-8"))
+    return narrate(sel)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,202 @@
+"""
+Benchmarks de render: compara opciones de codificación sobre un clip sintético (o uno real).
+
+Comparativas disponibles:
+  - intermediate: formatos intermedios de los clips (INTERMEDIATE_FORMATS).
+    Mide tiempo de codificación, tamaño, decodificación completa, búsqueda
+    aleatoria (seek + 30 frames) y PSNR frente al original.
+  - background: relleno del 9:16 alrededor del cuadrado. Negro frente a desenfoque a
+    baja resolución (el de ffmpeg_render) y a resolución completa, solo filtros
+    (sin codificar) y con el NumPy de compositor.blur_fill por frame.
+  - frames: comprobación (no medida). Cuenta los frames que salen de clip_filter con cada
+    fondo a 30 y 23.976 fps desde clips de duración exacta; sale con error si falta alguno.
+
+Uso:
+  python scripts/bench_render.py intermediate
+  python scripts/bench_render.py intermediate --source assets/trailers/xxx_trailer.mp4
+  python scripts/bench_render.py background
+  python scripts/bench_render.py frames
+
+El clip sintético (testsrc2 + grano) se genera en temp/bench/ y se reutiliza.
+"""
+import argparse
+import logging
+import math
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+ROOT = Path(__file__).resolve().parents[1]
+BENCH_DIR = ROOT / "temp" / "bench"
+
+sys.path.insert(0, str(Path(__file__).parent))
+import extract_video_clips_from_trailer as extract
+import compositor
+import ffmpeg_render
+
+BENCH_DURATION = extract.CLIP_DURATION
+
+
+def _run(cmd: list) -> tuple[float, str]:
+    """Ejecuta un comando y devuelve (segundos, stderr)."""
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors="replace")
+    elapsed = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(f"Falló: {' '.join(cmd[:6])}... -> {proc.stderr[-300:]}")
+    return elapsed, proc.stderr
+
+
+def make_synthetic_source(w: int = 1920, h: int = 1080, fps: int = 30, dur: float = BENCH_DURATION) -> Path:
+    """Clip de prueba con movimiento y grano (el ruido hace que se comporte como cine real)."""
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    out = BENCH_DIR / f"synthetic_{w}x{h}_{fps}.mp4"
+    if out.exists():
+        return out
+    logging.info(f"🧪 Generando clip sintético {w}x{h}@{fps} ({dur}s)...")
+    _run([
+        'ffmpeg', '-y',
+        '-f', 'lavfi', '-i', f'testsrc2=size={w}x{h}:rate={fps}:duration={dur}',
+        '-vf', 'noise=alls=12:allf=t',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '12', '-pix_fmt', 'yuv420p',
+        str(out)
+    ])
+    return out
+
+
+def _psnr(encoded: Path, reference: Path, dur: float) -> float | None:
+    _, err = _run([
+        'ffmpeg', '-i', str(encoded), '-t', str(dur), '-i', str(reference),
+        # Emparejar por número de frame: MKV redondea los timestamps a ms
+        '-lavfi', '[0:v]settb=1/30,setpts=N[enc];[1:v]fps=30,settb=1/30,setpts=N[ref];[enc][ref]psnr',
+        '-f', 'null', '-'
+    ])
+    m = re.search(r"average:([\d.]+|inf)", err)
+    if not m:
+        return None
+    return float("inf") if m.group(1) == "inf" else float(m.group(1))
+
+
+def bench_intermediate(source: Path, start: float = 0.0):
+    """Codifica la misma ventana con cada formato intermedio y mide coste/beneficio."""
+    rows = []
+    for name, fmt in extract.INTERMEDIATE_FORMATS.items():
+        out = BENCH_DIR / f"intermediate_{name}{fmt['ext']}"
+        enc_t, _ = _run([
+            'ffmpeg', '-y', '-ss', str(start), '-i', str(source), '-t', str(BENCH_DURATION),
+            *fmt["args"], '-r', '30', '-an', str(out)
+        ])
+        dec_t, _ = _run(['ffmpeg', '-i', str(out), '-f', 'null', '-'])
+        seek_t, _ = _run(['ffmpeg', '-ss', str(BENCH_DURATION / 2), '-i', str(out), '-frames:v', '30', '-f', 'null', '-'])
+        psnr = _psnr(out, source, BENCH_DURATION)
+        rows.append((name, enc_t, out.stat().st_size / (1024 * 1024), dec_t, seek_t, psnr))
+
+    default = extract.INTERMEDIATE_FORMAT
+    logging.info("")
+    logging.info(f"{'formato':<12} {'codif(s)':>9} {'MB':>8} {'decod(s)':>9} {'seek(s)':>8} {'PSNR(dB)':>9}")
+    for name, enc_t, mb, dec_t, seek_t, psnr in rows:
+        mark = " *" if name == default else ""
+        psnr_str = f"{psnr:9.2f}" if psnr is not None else f"{'?':>9}"
+        logging.info(f"{name:<12} {enc_t:9.2f} {mb:8.2f} {dec_t:9.2f} {seek_t:8.3f} {psnr_str}{mark}")
+    logging.info("(* = formato por defecto actual)")
+    return rows
+
+
+def bench_background(source: Path, start: float = 0.0, width: int = 1080):
+    """Coste del filtergraph de un clip 9:16 con cada tipo de fondo (decodificación incluida)."""
+    height = width * 16 // 9
+    timeline = {"width": width, "height": height, "square_size": width, "fps_expr": "30"}
+    clip = {"duration": BENCH_DURATION}
+
+    def graph(background: str, downscale: int, radius: int) -> str:
+        saved = ffmpeg_render.BLUR_DOWNSCALE, ffmpeg_render.BLUR_RADIUS
+        ffmpeg_render.BLUR_DOWNSCALE, ffmpeg_render.BLUR_RADIUS = downscale, radius
+        try:
+            return ffmpeg_render.clip_filter("0:v", clip, {**timeline, "background": background}, "v")
+        finally:
+            ffmpeg_render.BLUR_DOWNSCALE, ffmpeg_render.BLUR_RADIUS = saved
+
+    low = ffmpeg_render.BLUR_DOWNSCALE
+    variants = [
+        ("negro", graph("black", low, ffmpeg_render.BLUR_RADIUS)),
+        (f"blur 1/{low}", graph("blur", low, ffmpeg_render.BLUR_RADIUS)),
+        # Mismo radio efectivo, pero desenfocando a tamaño completo
+        ("blur 1/1", graph("blur", 1, ffmpeg_render.BLUR_RADIUS * low)),
+    ]
+    frames = round(BENCH_DURATION * 30)
+    rows = []
+    for name, g in variants:
+        elapsed, _ = _run(['ffmpeg', '-ss', str(start), '-i', str(source), '-filter_complex', g,
+                           '-map', '[v]', '-frames:v', str(frames), '-f', 'null', '-'])
+        rows.append((name, elapsed, frames / elapsed))
+
+    # Vía NumPy (moviepy): coste por frame de compositor.blur_fill sobre un frame real
+    frame_png = BENCH_DIR / "bg_frame.png"
+    _run(['ffmpeg', '-y', '-ss', str(start), '-i', str(source), '-frames:v', '1', str(frame_png)])
+    frame = np.asarray(Image.open(frame_png).convert("RGB"))
+    t0 = time.perf_counter()
+    for _ in range(20):
+        compositor.blur_fill(frame, width, height, low, ffmpeg_render.BLUR_RADIUS)
+    numpy_ms = (time.perf_counter() - t0) / 20 * 1000
+
+    base = rows[0][1]
+    logging.info("")
+    logging.info(f"{'fondo':<12} {'filtros(s)':>10} {'fps':>8} {'vs negro':>9}")
+    for name, elapsed, fps in rows:
+        logging.info(f"{name:<12} {elapsed:10.2f} {fps:8.1f} {elapsed / base:8.2f}x")
+    logging.info(f"NumPy blur_fill 1/{low}: {numpy_ms:.1f} ms/frame ({width}x{height})")
+    return rows, numpy_ms
+
+
+def check_frames(width: int = 360) -> bool:
+    """Frames de clip_filter por fondo y cadencia: deben ser ceil(duración * fps), sin perder el último."""
+    height = width * 16 // 9
+    ok = True
+    for fps_expr in ("30", "24000/1001"):
+        num, _, den = fps_expr.partition("/")
+        fps = int(num) / int(den or 1)
+        expected = math.ceil(round(BENCH_DURATION * fps, 6))
+        # Clip justo de esa duración: el caso en que el desenfoque perdía el último frame
+        source = BENCH_DIR / f"exact_{num}_{den or 1}.mp4"
+        if not source.exists():
+            _run(['ffmpeg', '-y', '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate={fps_expr}:duration={expected / fps}',
+                  '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p', str(source)])
+        for background in ("black", "blur"):
+            timeline = {"width": width, "height": height, "square_size": width, "fps_expr": fps_expr,
+                        "background": background}
+            g = ffmpeg_render.clip_filter("0:v", {"duration": BENCH_DURATION}, timeline, "v")
+            _, err = _run(['ffmpeg', '-i', str(source), '-filter_complex', g, '-map', '[v]', '-f', 'null', '-'])
+            counts = re.findall(r"frame=\s*(\d+)", err)
+            got = int(counts[-1]) if counts else 0
+            ok &= got == expected
+            logging.info(f"{'✅' if got == expected else '❌'} {background:<6} @ {fps_expr:<10} {got}/{expected} frames")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de render")
+    parser.add_argument("bench", choices=["intermediate", "background", "frames"], help="Comparativa a ejecutar")
+    parser.add_argument("--source", type=Path, help="Vídeo real a usar en vez del sintético")
+    parser.add_argument("--start", type=float, default=0.0, help="Segundo de inicio de la ventana en --source")
+    args = parser.parse_args()
+
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    if args.bench == "frames":
+        sys.exit(0 if check_frames() else 1)
+    source = args.source or make_synthetic_source()
+
+    if args.bench == "intermediate":
+        bench_intermediate(source, args.start)
+    elif args.bench == "background":
+        bench_background(source, args.start)
+
+
+if __name__ == "__main__":
+    main()
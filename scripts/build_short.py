@@ -1,4 +1,22 @@
 # scripts/build_short.py
+"""
+Monta el Short final: póster + clips + narración + música.
+
+Uso:
+  python scripts/build_short.py              # render final
+  python scripts/build_short.py --draft      # borrador rápido 540x960 (<id>_<slug>_draft.mp4)
+  python scripts/build_short.py --promote    # render final de la última línea de tiempo guardada,
+                                             # sin volver a generar guion ni voz
+  python scripts/build_short.py --remux-audio nueva_voz.mp3 [--video X_final.mp4] [--music pista.mp3]
+                                             # solo rehace la mezcla de audio del MP4 ya renderizado
+                                             # (vídeo con -c:v copy): segundos en vez de un render
+  --languages en,pt                          # tras el render final: variantes en otros idiomas
+                                             # (output/shorts/variants/) con la misma pista de vídeo
+  --profiles 1x1,16x9                        # además del 9:16, otros formatos (output/shorts/profiles/)
+                                             # del mismo render: cada clip se decodifica una sola vez
+  --low-priority                             # nice/ionice (BELOW_NORMAL en Windows) para equipos compartidos
+"""
+import argparse
 import time
 import unicodedata
 import random
@@ -8,6 +26,14 @@ from PIL import Image
 import numpy as np
 
 import ai_narration  # CAMBIO: Importamos el script de narración con Gemini
+import build_youtube_metadata
+import captions
+import compositor
+import clip_analysis
+import encoder_autotune
+import ffmpeg_render
+import media_probe
+import output_policy
 import tempfile
 import shutil
 from slugify import slugify
@@ -27,14 +53,52 @@ MANIFEST = STATE / "assets_manifest.json"
 TMP_DIR = ROOT / "assets" / "tmp"
 TMP_DIR.mkdir(parents=True, exist_ok=True)
 SEL_FILE = TMP_DIR / "next_release.json"
+TIMELINE_FILE = STATE / "timeline.json"  # Última línea de tiempo montada (para --promote)
+VARIANTS_DIR = SHORTS_DIR / "variants"    # Variantes por idioma (no las sube upload_youtube)
+PROFILES_DIR = SHORTS_DIR / "profiles"    # Otros formatos (1:1, 16:9) para otras plataformas
 
 # W, H = 1080, 1920  <- Ahora se calculan dinámicamente en main()
 INTRO_DURATION = 4
 CLIP_DURATION = 6
 MAX_CLIPS_TO_USE = 4  # Renombrado de MAX_BACKDROPS para claridad
-FPS_TARGET = 30 # Estándar para evitar cuelgues y asegurar compatibilidad
+# FPS, resolución y bitrate de salida: ver output_policy.py
 
-def clip_from_img(path: Path, dur: float, w: int, h: int, fps: float = FPS_TARGET) -> ImageClip:
+# Backend de render: "ffmpeg" (filtergraph nativo por tramos cacheados, ver ffmpeg_render.py)
+# o "moviepy" (composición frame a frame en Python). Si ffmpeg falla se cae a moviepy.
+RENDER_BACKEND = "ffmpeg"
+
+# Recorte inteligente: el cuadrado sigue la zona de interés del clip (bordes + movimiento,
+# analizado a miniatura, ver clip_analysis.crop_path) en vez de quedarse siempre en el centro.
+# moviepy no admite un recorte que varía con el tiempo: usa la posición media.
+SMART_CROP = True
+
+# Relleno arriba y abajo del cuadrado: "blur" (el propio clip desenfocado, calculado a baja
+# resolución; ver ffmpeg_render.blur_fill_filter y compositor.blur_fill) o "black".
+BACKGROUND = "blur"
+
+# Subtítulos quemados a partir del guion (sprites cacheados compuestos como capas, ver captions.py)
+CAPTIONS_ENABLED = True
+
+# Borrador: misma línea de tiempo a 540x960 con preset rápido, para iterar guion/música/clips
+DRAFT_SIZE = (540, 960)
+DRAFT_ENCODE = {"preset": "veryfast", "crf": "28", "bitrate": "1500k", "maxrate": "2000k", "bufsize": "4000k"}
+
+# Render final: preset x264 de más calidad que quepa en este presupuesto (segundos) según el
+# perfil del equipo (python scripts/encoder_autotune.py). Sin perfil: VIDEO_PRESET por defecto.
+RENDER_TIME_BUDGET = 180
+
+# Variantes por idioma tras el render final (igual que --languages), p. ej. ["en", "pt"].
+# Cada variante lleva su narración (ai_narration.LANGUAGES) y su metadata. Sin subtítulos
+# reutiliza el vídeo del _final con -c:v copy; con subtítulos (dependen del idioma) cada
+# variante es un render completo con los suyos (solo los trozos sin texto salen del caché).
+FANOUT_LANGUAGES = []
+
+# Formatos extra del render final (igual que --profiles), claves de output_policy.PROFILES,
+# p. ej. ["1x1", "16x9"]. Se renderizan en la misma pasada que el 9:16 (ffmpeg_render.render_profiles).
+OUTPUT_PROFILES = []
+LOW_PRIORITY = False  # Igual que --low-priority
+
+def clip_from_img(path: Path, dur: float, w: int, h: int, fps: float = output_policy.DEFAULT_FPS) -> ImageClip:
     """Crea un clip de video a partir de una imagen con duración dada."""
     try:
         img_clip = ImageClip(str(path), duration=dur).with_fps(fps)
@@ -54,9 +118,10 @@ def clip_from_img(path: Path, dur: float, w: int, h: int, fps: float = FPS_TARGE
         logging.error(f"Error al cargar imagen {path}: {e}")
         return None
 
-def resize_to_9_16(clip: VideoFileClip, target_w: int, target_h: int, square_size: int, fps: float = 30) -> VideoFileClip:
+def resize_to_9_16(clip: VideoFileClip, target_w: int, target_h: int, square_size: int, fps: float = output_policy.DEFAULT_FPS,
+                   center_x: float = 0.5, background: str = "black") -> VideoFileClip:
     """
-    Recorta el centro del clip a un formato cuadrado y lo coloca en un fondo vertical 9:16.
+    Recorta un cuadrado del clip (centrado en `center_x`, fracción del ancho) y lo coloca en un fondo vertical 9:16.
     """
     logging.info(f"Dimensiones originales del clip: {clip.w}x{clip.h}")
     
@@ -67,155 +132,182 @@ def resize_to_9_16(clip: VideoFileClip, target_w: int, target_h: int, square_siz
     if crop_width % 2 != 0:
         crop_width -= 1
 
-    # Recorte central cuadrado
-    square_clip = clip.cropped(x_center=clip.w / 2, y_center=clip.h / 2, width=crop_width, height=crop_width)
+    # Recorte cuadrado (central salvo recorte inteligente), sin salirse del frame
+    x_center = min(max(center_x * clip.w, crop_width / 2), clip.w - crop_width / 2)
+    square_clip = clip.cropped(x_center=x_center, y_center=clip.h / 2, width=crop_width, height=crop_width)
     
     # Redimensionado al tamaño cuadrado proporcional al destino
     square_clip = square_clip.resized(width=square_size)
 
     logging.info(f"Dimensiones tras recorte y reescalado a cuadrado: {square_clip.w}x{square_clip.h}")
     
-    background = ColorClip(size=(target_w, target_h), color=(0, 0, 0), duration=clip.duration).with_fps(fps)
+    if background == "blur":
+        # Fondo desenfocado por frame en NumPy a baja resolución (ver compositor.blur_fill)
+        bg_clip = clip.image_transform(lambda frame: compositor.blur_fill(
+            frame, target_w, target_h, ffmpeg_render.BLUR_DOWNSCALE, ffmpeg_render.BLUR_RADIUS,
+            ffmpeg_render.BLUR_BRIGHTNESS)).with_fps(fps)
+    else:
+        bg_clip = ColorClip(size=(target_w, target_h), color=(0, 0, 0), duration=clip.duration).with_fps(fps)
 
     final_clip = CompositeVideoClip([
-        background,
+        bg_clip,
         square_clip.with_position("center")
     ]).with_duration(clip.duration).with_fps(fps)
 
     return final_clip
 
-def main():
-    if not SEL_FILE.exists() or not MANIFEST.exists():
-        logging.error("Falta next_release.json o assets_manifest.json.")
-        return None
-
-    sel = json.loads(SEL_FILE.read_text(encoding="utf-8"))
-    man = json.loads(MANIFEST.read_text(encoding="utf-8"))
-
-    tmdb_id = sel.get("tmdb_id")
-    title = sel.get("titulo")
-    slug = slugify(title)
+def build_timeline(man: dict, voice_path, policy: dict, script: str | None = None) -> dict | None:
+    """
+    Línea de tiempo del Short, común a los dos backends de render (ffmpeg y moviepy).
 
+    Póster de INTRO_DURATION s + hasta MAX_CLIPS_TO_USE clips de CLIP_DURATION s,
+    narración con 1 s de silencio previo, una música aleatoria de assets/music y,
+    si hay guion y CAPTIONS_ENABLED, subtítulos como capas.
+    """
     poster_path = ROOT / man.get("poster", "")
-    video_clips_paths = [ROOT / p for p in man.get("video_clips", []) if (ROOT / p).exists()]
-    # Usamos un estándar de 30 FPS para evitar problemas de sincronización y cuelgues
-    trailer_fps = FPS_TARGET 
-    
-    # Dinamismo: Intentamos usar la resolución original del tráiler pero en vertical
-    # Si el tráiler es 4K (3840x2160), el short será 2160x3840.
-    orig_w = man.get("trailer_w", 1920)
-    orig_h = man.get("trailer_h", 1080)
-    
-    # El ancho del Short es la altura del tráiler original (para hacerlo vertical)
-    target_w = min(orig_w, orig_h) 
-    # El alto del Short mantiene la proporción 9:16 basada en ese ancho
-    target_h = int(target_w * 16 / 9)
-    
-    # Aseguramos que sean pares
-    if target_w % 2 != 0: target_w -= 1
-    if target_h % 2 != 0: target_h -= 1
-    
-    square_size = target_w # El cuadrado central ocupa todo el ancho
-
     if not poster_path.exists():
         logging.error("No se encontró el archivo del póster principal.")
         return None
-        
-    if not video_clips_paths:
-        logging.error("No hay clips de video disponibles.")
-        return None
 
-    # Información mostrada detalladamente en ai_narration.py (PRE-RENDER)
-
-    # CAMBIO: Llamamos directamente a la función main de nuestro script de narración con Gemini.
-    narracion, voice_path = ai_narration.main()
-    if not voice_path or not os.path.exists(voice_path):
-        logging.error("No se pudo obtener narración.")
+    clips = []
+    for clip_path in [ROOT / p for p in man.get("video_clips", []) if (ROOT / p).exists()][:MAX_CLIPS_TO_USE]:
+        # Duración desde el sondeo compartido (media_probe), sin depender del lector de moviepy
+        clip_info = media_probe.probe(clip_path)
+        if not clip_info or not clip_info.get("duration"):
+            logging.warning(f"Fallo en clip {clip_path}: no se pudo sondear.")
+            continue
+        # VOLVEMOS A DURACIÓN FIJA
+        clip = {"path": str(clip_path), "duration": min(CLIP_DURATION, clip_info["duration"])}
+        if SMART_CROP:
+            try:
+                clip["crop_path"] = clip_analysis.crop_path(clip_path, clip["duration"])
+            except Exception as e:
+                logging.warning(f"Recorte inteligente no disponible para {clip_path.name}: {e}")
+        clips.append(clip)
+    if not clips:
+        logging.error("No hay clips de video disponibles.")
         return None
 
-    # Guardar el guión en el JSON para poder mostrarlo después
-    if narracion:
-        sel['guion_generado'] = narracion
-        SEL_FILE.write_text(json.dumps(sel, ensure_ascii=False, indent=2), encoding="utf-8")
-
-    tmp_base = ROOT / 'temp'
-    tmp_base.mkdir(exist_ok=True)
-    tmp_dir = Path(tempfile.mkdtemp(dir=tmp_base, prefix=f"build_{tmdb_id}_"))
-
+    music_path = None
+    music_dir = ROOT / "assets" / "music"
+    music_files = list(music_dir.glob("*.mp3")) if music_dir.exists() else []
+    if music_files:
+        music_path = random.choice(music_files)
+    else:
+        logging.info("No se encontraron archivos de música válidos. Solo narración.")
+
+    timeline = {
+        "width": policy["width"],
+        "height": policy["height"],
+        "fps": policy["fps"],
+        "fps_expr": policy["fps_expr"],
+        # Control de tasa (bitrate objetivo y, con capped_crf, crf + techo VBV)
+        **{k: policy[k] for k in ("bitrate", "crf", "maxrate", "bufsize") if k in policy},
+        "square_size": policy["width"],  # El cuadrado central ocupa todo el ancho
+        "background": BACKGROUND,
+        "intro": {"path": str(poster_path), "duration": INTRO_DURATION},
+        "clips": clips,
+        "voice": str(voice_path),
+        "voice_delay": 1.0,
+        "music": str(music_path) if music_path else None,
+        "music_volume": 0.07,
+        "music_fade": 1.0,
+        "overlays": [],
+    }
+
+    if CAPTIONS_ENABLED and script:
+        try:
+            total = INTRO_DURATION + sum(c["duration"] for c in clips)
+            timeline["overlays"] = captions.build_overlays(script, voice_path, timeline["width"],
+                                                           timeline["voice_delay"], total)
+        except Exception as e:
+            logging.warning(f"⚠️ No se pudieron generar subtítulos, se renderiza sin ellos: {e}")
+    return timeline
+
+def render_moviepy(timeline: dict, out_file: Path, tmp_dir: Path):
+    """Backend histórico: compone cada frame con moviepy y codifica con write_videofile."""
+    target_w, target_h = timeline["width"], timeline["height"]
+    trailer_fps = timeline["fps"]
+    square_size = timeline["square_size"]
     opened_video_clips = []
-    
+
     try:
         logging.info(f"Creando clip de introducción de {INTRO_DURATION}s con el póster...")
-        intro_clip = clip_from_img(poster_path, INTRO_DURATION, target_w, target_h, fps=trailer_fps)
+        intro_clip = clip_from_img(Path(timeline["intro"]["path"]), timeline["intro"]["duration"], target_w, target_h, fps=trailer_fps)
         if intro_clip is None:
-            logging.error("Fallo al crear el clip de introducción.")
-            return None
+            raise RuntimeError("Fallo al crear el clip de introducción.")
 
-        logging.info(f"Procesando {len(video_clips_paths[:MAX_CLIPS_TO_USE])} clips de vídeo...")
+        logging.info(f"Procesando {len(timeline['clips'])} clips de vídeo...")
         video_clips_resized = []
-        for i, clip_path in enumerate(video_clips_paths[:MAX_CLIPS_TO_USE]):
+        for i, item in enumerate(timeline["clips"]):
             try:
-                clip = VideoFileClip(str(clip_path)).with_fps(trailer_fps)
+                clip = VideoFileClip(item["path"]).with_fps(trailer_fps)
                 opened_video_clips.append(clip)
-                
-                # VOLVEMOS A DURACIÓN FIJA
-                end_time = min(CLIP_DURATION, clip.duration)
-                sub_clip = clip.subclipped(0, end_time)
-                
+                sub_clip = clip.subclipped(0, min(item["duration"], clip.duration))
+
                 logging.info(f"  - Clip {i+1}: Redimensionando a 9:16... (duración: {sub_clip.duration:.2f}s)")
-                resized_clip = resize_to_9_16(sub_clip, target_w, target_h, square_size, fps=trailer_fps)
+                path = item.get("crop_path")
+                center_x = sum(c for _, c in path) / len(path) if path else 0.5
+                resized_clip = resize_to_9_16(sub_clip, target_w, target_h, square_size, fps=trailer_fps, center_x=center_x,
+                                              background=timeline.get("background", "black"))
                 video_clips_resized.append(resized_clip)
             except Exception as e:
-                logging.warning(f"Fallo en clip {clip_path}: {e}")
+                logging.warning(f"Fallo en clip {item['path']}: {e}")
 
         if not video_clips_resized:
-            logging.error("No se pudieron procesar clips de video.")
-            return None
+            raise RuntimeError("No se pudieron procesar clips de video.")
 
         logging.info("Concatenando clips de vídeo para la secuencia final...")
         # CAMBIO: Usamos method="chain" para evitar frames negros entre clips
         final_video = concatenate_videoclips([intro_clip] + video_clips_resized, method="chain")
 
+        if timeline.get("overlays"):
+            # Capas (ver compositor.py): posición y ancho relativos al frame
+            layers = []
+            for o in timeline["overlays"]:
+                layer = ImageClip(o["path"])
+                if o.get("width"):
+                    layer = layer.resized(width=max(1, round(o["width"] * target_w)))
+                end = min(o.get("end") or final_video.duration, final_video.duration)
+                layers.append(layer.with_start(o.get("start", 0.0)).with_end(end)
+                              .with_position((round(o.get("x", 0.0) * target_w), round(o.get("y", 0.0) * target_h))))
+            final_video = CompositeVideoClip([final_video] + layers).with_duration(final_video.duration)
+
         logging.info("Preparando pista de audio...")
-        raw_voice = AudioFileClip(str(voice_path))
+        raw_voice = AudioFileClip(timeline["voice"])
         
-        silence_padding = AudioClip(lambda t: [0, 0], duration=1.0, fps=44100)
+        silence_padding = AudioClip(lambda t: [0, 0], duration=timeline["voice_delay"], fps=44100)
         audio_clip = concatenate_audioclips([silence_padding, raw_voice])
         
         final_audio = audio_clip
 
-        music_dir = ROOT / "assets" / "music"
-        if music_dir.exists() and list(music_dir.glob("*.mp3")):
-            music_files = list(music_dir.glob("*.mp3"))
-            if music_files:
-                music_path = random.choice(music_files)
-                try:
-                    logging.info(f"Añadiendo música de fondo desde '{music_path.name}'...")
-                    music_clip = AudioFileClip(str(music_path))
-                    
-                    # FIX: Usa concatenate_audioclips para loop (compatible con v1/v2, evita issues en .loop())
-                    if music_clip.duration < final_video.duration:
-                        repeats = int(final_video.duration / music_clip.duration) + 1
-                        music_clip = concatenate_audioclips([music_clip] * repeats)
-                    
-                    # v2 FIX: Usa .subclipped()
-                    music_clip = music_clip.subclipped(0, final_video.duration)
-                    
-                    # FIX: Usa .with_effects() como en versión antigua (más estable en v2 para chains)
-                    audio_clip = audio_clip.with_effects([afx.AudioNormalize()])
-                    music_clip = music_clip.with_effects([
-                        afx.AudioNormalize(),
-                        afx.AudioFadeIn(1.0),
-                        afx.AudioFadeOut(1.0),
-                        afx.MultiplyVolume(0.07)
-                    ])
-                    final_audio = CompositeAudioClip([audio_clip, music_clip])
-                    
-                    logging.info(f"Música de fondo aleatoria añadida desde {music_path.name}.")
-                except Exception as e:
-                    logging.warning(f"No se pudo añadir música desde {music_path}: {e}")
-        else:
-            logging.info("No se encontraron archivos de música válidos. Solo narración.")
+        if timeline["music"]:
+            music_path = Path(timeline["music"])
+            try:
+                logging.info(f"Añadiendo música de fondo desde '{music_path.name}'...")
+                music_clip = AudioFileClip(str(music_path))
+                
+                # FIX: Usa concatenate_audioclips para loop (compatible con v1/v2, evita issues en .loop())
+                if music_clip.duration < final_video.duration:
+                    repeats = int(final_video.duration / music_clip.duration) + 1
+                    music_clip = concatenate_audioclips([music_clip] * repeats)
+                
+                # v2 FIX: Usa .subclipped()
+                music_clip = music_clip.subclipped(0, final_video.duration)
+                
+                # FIX: Usa .with_effects() como en versión antigua (más estable en v2 para chains)
+                audio_clip = audio_clip.with_effects([afx.AudioNormalize()])
+                music_clip = music_clip.with_effects([
+                    afx.AudioNormalize(),
+                    afx.AudioFadeIn(timeline["music_fade"]),
+                    afx.AudioFadeOut(timeline["music_fade"]),
+                    afx.MultiplyVolume(timeline["music_volume"])
+                ])
+                final_audio = CompositeAudioClip([audio_clip, music_clip])
+                
+                logging.info(f"Música de fondo aleatoria añadida desde {music_path.name}.")
+            except Exception as e:
+                logging.warning(f"No se pudo añadir música desde {music_path}: {e}")
         
         # FIX: Manejo de silencio con AudioClip lambda (compatible)
         if final_audio.duration < final_video.duration:
@@ -225,43 +317,21 @@ def main():
         
         final_clip = final_video.with_audio(final_audio)
 
-        out_file = SHORTS_DIR / f"{tmdb_id}_{slug}_final.mp4"
-
-        # --- PREVIEW GENERATION REMOVED ---
-        logging.info("ℹ️ Vista previa rápida omitida.")
-        
         # Define una ruta para el audio temporal dentro de tmp_dir
         temp_audio_path = tmp_dir / "temp_audio_mix.mp3" 
 
-        # Ajuste de bitrate dinámico: ~8Mbps para 1080p, ~35Mbps para 4K
-        bitrate_calc = "35000k" if target_w >= 2000 else "12000k"
-
         logging.info(f"Renderizando vídeo final ({target_w}x{target_h}) en '{out_file.name}'...")
         final_clip.write_videofile(
             str(out_file),
             codec="libx264",
             fps=trailer_fps,
-            preset="medium",
-            bitrate=bitrate_calc,
-            ffmpeg_params=["-crf", "18", "-pix_fmt", "yuv420p", "-movflags", "faststart"],
+            preset=timeline.get("preset", ffmpeg_render.VIDEO_PRESET),
+            bitrate=timeline["bitrate"],
+            ffmpeg_params=["-crf", str(timeline.get("crf", ffmpeg_render.VIDEO_CRF)), "-pix_fmt", "yuv420p", "-movflags", "faststart"]
+                          + (["-maxrate", timeline["maxrate"], "-bufsize", timeline["bufsize"]] if timeline.get("maxrate") else []),
             temp_audiofile=str(temp_audio_path), 
             remove_temp=True 
         )
-        logging.info(f"✅ Short generado con éxito.")
-
-        manifest_path = STATE / "assets_manifest.json"
-        if manifest_path.exists():
-            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
-            manifest["mp4_path"] = str(out_file.relative_to(ROOT))  # Guarda path relativo
-            manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
-            logging.info(f"Path del MP4 guardado en manifiesto: {out_file}")
-
-        return str(out_file)
-
-    except Exception as e:
-        logging.error(f"Error en build_short: {e}", exc_info=True)
-        return None
-
     finally:
         # Cierre de clips de vídeo para liberar memoria
         for clip in opened_video_clips:
@@ -269,9 +339,242 @@ def main():
                 clip.close()
             except Exception:
                 pass  # Ignorar errores al cerrar
+
+def draft_timeline(timeline: dict) -> dict:
+    """La misma línea de tiempo en tamaño y calidad de borrador."""
+    w, h = DRAFT_SIZE
+    return {**timeline, "width": w, "height": h, "square_size": w, **DRAFT_ENCODE}
+
+def save_timeline(timeline: dict, tmdb_id, slug: str):
+    try:
+        STATE.mkdir(parents=True, exist_ok=True)
+        data = {"tmdb_id": tmdb_id, "slug": slug, "timeline": timeline}
+        TIMELINE_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    except Exception as e:
+        logging.warning(f"No se pudo guardar la línea de tiempo: {e}")
+
+def render(timeline: dict, out_file: Path, tmp_dir: Path, profiles: dict | None = None):
+    """Renderiza con RENDER_BACKEND; si ffmpeg falla, reintenta con moviepy (solo el 9:16)."""
+    if RENDER_BACKEND == "ffmpeg":
+        try:
+            if profiles:
+                ffmpeg_render.render_profiles(timeline, {"9x16": out_file, **profiles})
+            else:
+                ffmpeg_render.render(timeline, out_file)
+            return
+        except Exception as e:
+            logging.warning(f"⚠️ Render ffmpeg falló, usando moviepy: {e}")
+    render_moviepy(timeline, out_file, tmp_dir)
+
+def render_to_file(timeline: dict, out_file: Path, tmdb_id, profiles: dict | None = None) -> bool:
+    """Renderiza en un directorio temporal propio y lo limpia al terminar (`profiles`: {formato: ruta} extra)."""
+    tmp_base = ROOT / 'temp'
+    tmp_base.mkdir(exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(dir=tmp_base, prefix=f"build_{tmdb_id}_"))
+    if LOW_PRIORITY:
+        encoder_autotune.lower_process_priority()
+    try:
+        t0 = time.time()
+        render(timeline, out_file, tmp_dir, profiles)
+        logging.info(f"⏱️ Render de '{out_file.name}' en {time.time() - t0:.1f}s.")
+        return True
+    except Exception as e:
+        logging.error(f"Error en build_short: {e}", exc_info=True)
+        return False
+    finally:
         # Limpieza de archivos temporales
         cleanup_temp_files(tmp_dir)
 
+def update_manifest_mp4(out_file: Path):
+    manifest_path = STATE / "assets_manifest.json"
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        manifest["mp4_path"] = str(out_file.relative_to(ROOT))  # Guarda path relativo
+        manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+        logging.info(f"Path del MP4 guardado en manifiesto: {out_file}")
+
+def promote():
+    """Render final de la línea de tiempo guardada (aprobada tras un --draft)."""
+    if not TIMELINE_FILE.exists():
+        logging.error("No hay línea de tiempo guardada. Ejecuta antes build_short.py --draft.")
+        return None
+    data = json.loads(TIMELINE_FILE.read_text(encoding="utf-8"))
+    timeline = data["timeline"]
+    missing = [p for p in [timeline["intro"]["path"], timeline["voice"], timeline.get("music")]
+               + [c["path"] for c in timeline["clips"]]
+               + [o["path"] for o in timeline.get("overlays", [])] if p and not Path(p).exists()]
+    if missing:
+        logging.error(f"Faltan ficheros de la línea de tiempo guardada: {missing}")
+        return None
+
+    out_file = SHORTS_DIR / f"{data['tmdb_id']}_{data['slug']}_final.mp4"
+    logging.info(f"⬆️ Promocionando borrador a render final ({timeline['width']}x{timeline['height']})...")
+    if not render_to_file(encoder_autotune.tune(timeline, RENDER_TIME_BUDGET), out_file, data["tmdb_id"]):
+        return None
+    logging.info(f"✅ Short generado con éxito.")
+    update_manifest_mp4(out_file)
+    return str(out_file)
+
+def remux(voice, video=None, music=None):
+    """Cambia narración (y/o música) de un Short ya renderizado sin recodificar el vídeo."""
+    if not TIMELINE_FILE.exists():
+        logging.error("No hay línea de tiempo guardada (hace falta un build_short.py previo).")
+        return None
+    data = json.loads(TIMELINE_FILE.read_text(encoding="utf-8"))
+    timeline = data["timeline"]
+    video = Path(video) if video else SHORTS_DIR / f"{data['tmdb_id']}_{data['slug']}_final.mp4"
+    missing = [str(p) for p in [video, voice, music] if p and not Path(p).exists()]
+    if missing:
+        logging.error(f"No existen: {missing}")
+        return None
+
+    timeline = {**timeline, "voice": str(Path(voice).resolve())}
+    if music:
+        timeline["music"] = str(Path(music).resolve())
+    if timeline.get("overlays"):
+        logging.warning("⚠️ Los subtítulos están quemados en el vídeo: siguen siendo los del guion anterior.")
+
+    t0 = time.time()
+    try:
+        ffmpeg_render.remux_audio(video, timeline, video)
+    except Exception as e:
+        logging.error(f"Error en el remux de audio: {e}")
+        return None
+    logging.info(f"🔁 Audio de '{video.name}' rehecho en {time.time() - t0:.1f}s (vídeo sin recodificar).")
+    save_timeline(timeline, data["tmdb_id"], data["slug"])
+    if video.stem.endswith("_final"):
+        update_manifest_mp4(video)
+    return str(video)
+
+def fanout(languages: list, timeline: dict, video: Path, tmdb_id, slug: str) -> list:
+    """
+    Una variante (MP4 + metadata) por idioma a partir del render final `video`.
+
+    Sin subtítulos la imagen no depende del idioma: cada variante reutiliza la pista de
+    `video` (-c:v copy) y solo rehace el audio. Con subtítulos el texto quemado es el de
+    cada narración, así que cada idioma es un render completo con los suyos: se recodifican
+    los trozos con texto y solo los que no llevan (la intro, p. ej.) salen del caché.
+    """
+    languages = [l for l in languages if l != ai_narration.DEFAULT_LANGUAGE]
+    if not languages:
+        return []
+    sel = json.loads(SEL_FILE.read_text(encoding="utf-8"))
+    VARIANTS_DIR.mkdir(parents=True, exist_ok=True)
+    burned = bool(timeline.get("overlays"))
+    how = "un render por idioma con sus subtítulos" if burned else f"vídeo de '{video.name}' sin recodificar"
+    logging.info(f"🌍 Variantes {', '.join(languages)}: {how}...")
+
+    outputs = []
+    for lang in languages:
+        lang_info = ai_narration.LANGUAGES.get(lang, {})
+        text, voice_path = ai_narration.narrate(sel, language=lang)
+        if not voice_path:
+            logging.error(f"❌ Sin narración en '{lang}', variante omitida.")
+            continue
+        out_file = VARIANTS_DIR / f"{tmdb_id}_{slug}_{lang}.mp4"
+        variant = {**timeline, "voice": str(voice_path), "overlays": []}
+        if burned and text:
+            try:
+                variant["overlays"] = captions.build_overlays(text, voice_path, variant["width"], variant["voice_delay"],
+                                                              ffmpeg_render.timeline_duration(variant))
+            except Exception as e:
+                logging.warning(f"⚠️ Sin subtítulos en '{lang}', se reutiliza el vídeo del render final: {e}")
+        t0 = time.time()
+        if variant["overlays"]:
+            if not render_to_file(encoder_autotune.tune(variant, RENDER_TIME_BUDGET), out_file, tmdb_id):
+                logging.error(f"❌ Error renderizando la variante '{lang}'.")
+                continue
+        else:
+            if burned:
+                logging.warning(f"⚠️ La variante '{lang}' lleva los subtítulos del render final.")
+            try:
+                ffmpeg_render.remux_audio(video, variant, out_file)
+            except Exception as e:
+                logging.error(f"❌ Error montando la variante '{lang}': {e}")
+                continue
+        build_youtube_metadata.main(lang, lang_info.get("name"), out_file.with_suffix(".json"))
+        logging.info(f"✅ Variante '{lang}' en {time.time() - t0:.1f}s: {out_file.name} — {text}")
+        outputs.append(str(out_file))
+    return outputs
+
+def profile_outputs(profiles: list, tmdb_id, slug: str) -> dict:
+    """{formato: ruta} de los formatos extra pedidos (el 9:16 es siempre el _final)."""
+    outputs = {}
+    for name in profiles:
+        if name not in output_policy.PROFILES:
+            logging.warning(f"Formato desconocido '{name}' (válidos: {', '.join(output_policy.PROFILES)}).")
+        elif name != "9x16":
+            outputs[name] = PROFILES_DIR / f"{tmdb_id}_{slug}_{name}.mp4"
+    return outputs
+
+def main(draft: bool = False, languages: list | None = None, profiles: list | None = None):
+    if not SEL_FILE.exists() or not MANIFEST.exists():
+        logging.error("Falta next_release.json o assets_manifest.json.")
+        return None
+
+    sel = json.loads(SEL_FILE.read_text(encoding="utf-8"))
+    man = json.loads(MANIFEST.read_text(encoding="utf-8"))
+
+    tmdb_id = sel.get("tmdb_id")
+    title = sel.get("titulo")
+    slug = slugify(title)
+
+    poster_path = ROOT / man.get("poster", "")
+    video_clips_paths = [ROOT / p for p in man.get("video_clips", []) if (ROOT / p).exists()]
+    # Política de salida: FPS nativos si son estándar (23.976 no se sube a 30) y el
+    # vertical limitado a MAX_OUTPUT_WIDTH (un tráiler 4K ya no da un render 2160x3840).
+    src_fps = man.get("trailer_fps")
+    if not src_fps and video_clips_paths:
+        src_info = media_probe.probe(video_clips_paths[0])
+        src_fps = src_info["fps"] if src_info else None
+    policy = output_policy.decide(src_fps, man.get("trailer_w"), man.get("trailer_h"))
+    output_policy.record(policy)
+    logging.info(f"🎯 Salida: {policy['width']}x{policy['height']} @ {policy['fps_expr']} fps, {policy['bitrate']} ({policy.get('rate_control', 'crf')}) "
+                 f"(origen {man.get('trailer_w')}x{man.get('trailer_h')} @ {src_fps})")
+
+    if not poster_path.exists():
+        logging.error("No se encontró el archivo del póster principal.")
+        return None
+        
+    if not video_clips_paths:
+        logging.error("No hay clips de video disponibles.")
+        return None
+
+    # Información mostrada detalladamente en ai_narration.py (PRE-RENDER)
+
+    # CAMBIO: Llamamos directamente a la función main de nuestro script de narración con Gemini.
+    narracion, voice_path = ai_narration.main()
+    if not voice_path or not os.path.exists(voice_path):
+        logging.error("No se pudo obtener narración.")
+        return None
+
+    # Guardar el guión en el JSON para poder mostrarlo después
+    if narracion:
+        sel['guion_generado'] = narracion
+        SEL_FILE.write_text(json.dumps(sel, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    timeline = build_timeline(man, voice_path, policy, script=narracion or sel.get('guion_generado'))
+    if timeline is None:
+        return None
+    save_timeline(timeline, tmdb_id, slug)
+
+    if draft:
+        out_file = SHORTS_DIR / f"{tmdb_id}_{slug}_draft.mp4"
+        logging.info(f"📝 Borrador {DRAFT_SIZE[0]}x{DRAFT_SIZE[1]} (aprobar con: build_short.py --promote)...")
+        if not render_to_file(draft_timeline(timeline), out_file, tmdb_id):
+            return None
+        logging.info(f"✅ Borrador listo: {out_file}")
+        return str(out_file)
+
+    out_file = SHORTS_DIR / f"{tmdb_id}_{slug}_final.mp4"
+    extra = profile_outputs(OUTPUT_PROFILES if profiles is None else profiles, tmdb_id, slug)
+    if not render_to_file(encoder_autotune.tune(timeline, RENDER_TIME_BUDGET), out_file, tmdb_id, extra):
+        return None
+    logging.info(f"✅ Short generado con éxito.")
+    update_manifest_mp4(out_file)
+    fanout(FANOUT_LANGUAGES if languages is None else languages, timeline, out_file, tmdb_id, slug)
+    return str(out_file)
+
 def cleanup_temp_files(tmpdir):
     time.sleep(2)
     # CAMBIO: Usamos shutil.rmtree para un borrado más robusto del directorio temporal
@@ -282,4 +585,25 @@ def cleanup_temp_files(tmpdir):
         logging.warning(f"No se pudo eliminar el directorio temporal {tmpdir}: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    parser = argparse.ArgumentParser(description="Monta el Short final")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--draft", action="store_true", help="Borrador rápido 540x960 junto al final")
+    group.add_argument("--promote", action="store_true", help="Render final de la última línea de tiempo guardada")
+    group.add_argument("--remux-audio", metavar="VOZ", help="Nueva narración sobre el vídeo ya renderizado (sin recodificar)")
+    parser.add_argument("--video", help="MP4 a remezclar con --remux-audio (por defecto, el _final de la última línea de tiempo)")
+    parser.add_argument("--music", help="Nueva música para --remux-audio")
+    parser.add_argument("--languages", help="Variantes en otros idiomas tras el render final, p. ej. en,pt")
+    parser.add_argument("--profiles", help="Formatos extra del render final, p. ej. 1x1,16x9")
+    parser.add_argument("--low-priority", action="store_true", help="Renderizar con prioridad baja de CPU/E/S")
+    args = parser.parse_args()
+    if args.low_priority:
+        LOW_PRIORITY = True
+    if args.remux_audio:
+        remux(args.remux_audio, args.video, args.music)
+    elif args.promote:
+        promote()
+    else:
+        languages = [l.strip() for l in args.languages.split(",") if l.strip()] if args.languages else None
+        profiles = [p.strip() for p in args.profiles.split(",") if p.strip()] if args.profiles else None
+        main(draft=args.draft, languages=languages, profiles=profiles)
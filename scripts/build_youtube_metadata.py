@@ -58,8 +58,42 @@ def _translate_title_with_ai(title: str) -> str | None:
         return None
 
 
+# --- Localización para variantes en otros idiomas ---
+def _localize_metadata_with_ai(metadata: dict, language_name: str) -> dict:
+    """Traduce título y descripción (mismo formato, hashtags incluidos). Si falla, devuelve el original."""
+    prompt = f"""
+    Traduce al {language_name} el título y la descripción de este Short de YouTube sobre un tráiler.
+    Mantén el formato, los emojis, las fechas y los hashtags (traduce solo los hashtags genéricos como #tráilerespañol).
+    El título de la película se deja tal cual salvo que tenga un título oficial conocido en ese idioma.
+    Devuelve SOLO un JSON: {{"title": "...", "description": "..."}}
+
+    TÍTULO: {metadata["title"]}
+    DESCRIPCIÓN:
+    {metadata["description"]}
+    """
+    try:
+        api_key = get_google_api_key()
+        if not api_key: return metadata
+
+        logging.info(f"Traduciendo metadata al {language_name} con el modelo '{GEMINI_MODEL}'...")
+        client = genai.Client(api_key=api_key)
+        response = client.models.generate_content(model=GEMINI_MODEL, contents=prompt)
+        match = re.search(r"\{.*\}", response.text, re.DOTALL)
+        data = json.loads(match.group(0)) if match else {}
+        if not data.get("title") or not data.get("description"):
+            raise ValueError(f"respuesta sin título o descripción: {response.text[:200]}")
+        return {**metadata, "title": data["title"].strip()[:100], "description": data["description"].strip()}
+    except Exception as e:
+        logging.error(f"No se pudo traducir la metadata ({e}); se usa la original.")
+        return metadata
+
+
 # --- Función Principal ---
-def main():
+def main(language: str = "es", language_name: str | None = None, out_file: Path | None = None):
+    """
+    Metadata de YouTube para el Short. Con `language` distinto de "es" (variantes de
+    build_short.py --languages) se traduce título y descripción y se guarda en `out_file`.
+    """
     if not SEL_FILE.exists():
         logging.error("Falta next_release.json. Asegúrate de que el proceso de selección o manual_publish ha terminado correctamente.")
         return
@@ -199,9 +233,16 @@ def main():
         "categoryId": "1"  # Film & Animation
     }
 
-    META_FILE.write_text(json.dumps(metadata, ensure_ascii=False, indent=2), encoding="utf-8")
-    logging.info(f"✅ Metadata de YouTube guardada en: {META_FILE}")
-    logging.info(f"   - Título final: {youtube_title}")
+    if language != "es":
+        metadata = _localize_metadata_with_ai(metadata, language_name or language)
+        metadata["defaultLanguage"] = language
+        metadata["defaultAudioLanguage"] = language
+
+    out_file = out_file or META_FILE
+    out_file.write_text(json.dumps(metadata, ensure_ascii=False, indent=2), encoding="utf-8")
+    logging.info(f"✅ Metadata de YouTube guardada en: {out_file}")
+    logging.info(f"   - Título final: {metadata['title']}")
+    return out_file
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,196 @@
+# scripts/captions.py
+"""
+Subtítulos quemados a partir de la narración (guion_generado).
+
+  1. El guion se parte en líneas cortas (cortando en signos de puntuación).
+  2. Cada línea se sitúa en el tiempo: con marcas por palabra del TTS si existen
+     (<narración>.timestamps.json junto al audio) o, si no, repartiendo la duración
+     de la voz en proporción al número de palabras (más una pausa tras cada frase).
+  3. Cada línea distinta se rasteriza UNA vez a un PNG RGBA (caché de sprites en
+     assets/segment_cache/captions, clave = hash de texto + estilo + ancho de frame).
+  4. El render solo compone esos sprites como capas ("overlays" de la línea de tiempo,
+     ver compositor.py), así que el coste por frame es una mezcla alfa de un rectángulo.
+     Lo que más pesa es que cada trozo con subtítulos pasa por la tubería rawvideo del
+     compositor: ~+27 % de tiempo de render (Short de 16 s a 720x1280, fondo desenfocado).
+
+Formato opcional de marcas de tiempo: [{"word": "Hola", "start": 0.12, "end": 0.40}, ...]
+"""
+import hashlib
+import json
+import logging
+import re
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFont
+
+import media_probe
+
+ROOT = Path(__file__).resolve().parents[1]
+SPRITE_DIR = ROOT / "assets" / "segment_cache" / "captions"
+
+MAX_CHARS = 26            # Caracteres máximos por línea
+MAX_WORDS = 6
+MIN_LINE_DURATION = 0.6   # Segundos mínimos en pantalla
+SENTENCE_PAUSE_WORDS = 1.5  # Peso extra (en palabras) de la pausa tras . ! ? …
+
+FONT_SIZE_RATIO = 0.056   # Tamaño de letra relativo al ancho del frame (~60 px a 1080)
+STROKE_RATIO = 0.12       # Grosor del contorno relativo al tamaño de letra
+TEXT_COLOR = (255, 255, 255, 255)
+STROKE_COLOR = (0, 0, 0, 255)
+MAX_WIDTH = 0.92          # Ancho máximo de una línea (fracción del frame); si no cabe, se escala
+Y_POSITION = 0.80         # Parte superior del texto (fracción del alto): franja inferior del 9:16
+STYLE_VERSION = 1         # Subir si cambia el estilo: invalida los sprites cacheados
+
+# Primera fuente disponible (Windows, Linux, macOS); si ninguna existe, la de Pillow
+FONT_CANDIDATES = [
+    "arialbd.ttf",
+    "C:/Windows/Fonts/arialbd.ttf",
+    "DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/Library/Fonts/Arial Bold.ttf",
+]
+
+_SENTENCE_END = re.compile(r"[.!?…]$")
+
+
+def clean_script(text: str) -> str:
+    """Quita lo que el TTS no lee (mismos símbolos que limpia ai_narration) y normaliza espacios."""
+    text = (text or "").replace("*", "").replace('"', "")
+    text = re.sub(r"\.{3,}", "…", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def split_lines(text: str, max_chars: int = MAX_CHARS, max_words: int = MAX_WORDS) -> list:
+    """Parte el guion en líneas cortas; nunca junta el final de una frase con la siguiente."""
+    lines, current = [], []
+    for word in clean_script(text).split(" "):
+        if not word or word == "…":
+            if current and word == "…":
+                current[-1] += "…"
+            continue
+        candidate = " ".join(current + [word])
+        if current and (len(candidate) > max_chars or len(current) >= max_words):
+            lines.append(" ".join(current))
+            current = []
+        current.append(word)
+        if re.search(r"[.!?…,;:]$", word) and len(" ".join(current)) >= max_chars // 2:
+            lines.append(" ".join(current))
+            current = []
+        elif _SENTENCE_END.search(word):
+            lines.append(" ".join(current))
+            current = []
+    if current:
+        lines.append(" ".join(current))
+    return lines
+
+
+def load_word_timestamps(voice_path) -> list | None:
+    """Marcas por palabra del TTS si existen junto al audio (<stem>.timestamps.json)."""
+    path = Path(voice_path).with_suffix(".timestamps.json")
+    if not path.exists():
+        return None
+    try:
+        words = json.loads(path.read_text(encoding="utf-8"))
+        return words if words and all("start" in w and "end" in w for w in words) else None
+    except (json.JSONDecodeError, OSError, TypeError):
+        logging.warning(f"Marcas de tiempo ilegibles en {path.name}; se reparte por palabras.")
+        return None
+
+
+def time_lines(lines: list, start: float, duration: float) -> list:
+    """[(línea, inicio, fin)] repartiendo `duration` en proporción a las palabras."""
+    weights = [len(l.split()) + (SENTENCE_PAUSE_WORDS if _SENTENCE_END.search(l) else 0) for l in lines]
+    total = sum(weights) or 1
+    timed, t = [], start
+    for line, w in zip(lines, weights):
+        d = duration * w / total
+        timed.append((line, t, t + max(d, MIN_LINE_DURATION)))
+        t += d
+    return timed
+
+
+def time_lines_from_words(lines: list, words: list, offset: float) -> list:
+    """[(línea, inicio, fin)] usando las marcas por palabra (se asume el mismo orden de palabras)."""
+    timed, i = [], 0
+    for line in lines:
+        n = len(line.split())
+        chunk = words[i:i + n]
+        if not chunk:
+            break
+        timed.append((line, offset + chunk[0]["start"], offset + max(chunk[-1]["end"], chunk[0]["start"] + MIN_LINE_DURATION)))
+        i += n
+    return timed
+
+
+def _font(size: int):
+    for name in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    logging.warning("⚠️ Ninguna fuente TrueType disponible para subtítulos; usando la de Pillow.")
+    return ImageFont.load_default(size=size)
+
+
+def render_sprite(text: str, frame_w: int) -> Path:
+    """PNG RGBA de una línea (rasterizado solo la primera vez que aparece ese texto)."""
+    key = hashlib.sha1(json.dumps([STYLE_VERSION, text, frame_w, FONT_SIZE_RATIO, STROKE_RATIO,
+                                   TEXT_COLOR, STROKE_COLOR]).encode("utf-8")).hexdigest()[:20]
+    path = SPRITE_DIR / f"caption_{key}.png"
+    if path.exists():
+        path.touch()  # Renovamos la antigüedad para la poda del caché (prune_segment_cache)
+        return path
+
+    size = max(10, round(frame_w * FONT_SIZE_RATIO))
+    stroke = max(1, round(size * STROKE_RATIO))
+    font = _font(size)
+    x0, y0, x1, y1 = ImageDraw.Draw(Image.new("RGBA", (1, 1))).textbbox((0, 0), text, font=font, stroke_width=stroke)
+    img = Image.new("RGBA", (x1 - x0, y1 - y0), (0, 0, 0, 0))
+    ImageDraw.Draw(img).text((-x0, -y0), text, font=font, fill=TEXT_COLOR,
+                             stroke_width=stroke, stroke_fill=STROKE_COLOR)
+
+    SPRITE_DIR.mkdir(parents=True, exist_ok=True)
+    part = path.with_name(path.stem + ".part.png")
+    img.save(part)
+    part.replace(path)
+    return path
+
+
+def build_overlays(script: str, voice_path, frame_w: int, voice_delay: float, total: float) -> list:
+    """Capas de subtítulos para la línea de tiempo (ver compositor.py)."""
+    lines = split_lines(script)
+    if not lines:
+        return []
+
+    words = load_word_timestamps(voice_path)
+    if words:
+        timed = time_lines_from_words(lines, words, voice_delay)
+        source = "marcas del TTS"
+    else:
+        info = media_probe.probe(voice_path)
+        speech = info["duration"] if info and info.get("duration") else total - voice_delay
+        timed = time_lines(lines, voice_delay, speech)
+        source = "reparto por palabras"
+
+    # Nunca dos líneas a la vez en el mismo sitio: cada una acaba cuando empieza la siguiente
+    timed = [(line, start, min(end, timed[i + 1][1]) if i + 1 < len(timed) else end)
+             for i, (line, start, end) in enumerate(timed)]
+
+    overlays = []
+    for line, start, end in timed:
+        if start >= total:
+            break
+        sprite = render_sprite(line, frame_w)
+        with Image.open(sprite) as im:
+            w = im.width
+        wfrac = min(MAX_WIDTH, w / frame_w)
+        overlays.append({
+            "path": str(sprite),
+            "x": (1.0 - wfrac) / 2,
+            "y": Y_POSITION,
+            "width": wfrac,
+            "start": round(start, 3),
+            "end": round(min(end, total), 3),
+        })
+    logging.info(f"💬 Subtítulos: {len(overlays)} líneas ({source}), {len({o['path'] for o in overlays})} sprites.")
+    return overlays
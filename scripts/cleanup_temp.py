@@ -3,6 +3,8 @@ import logging
 import shutil
 from pathlib import Path
 
+import ffmpeg_render
+
 # --- Definición de Rutas ---
 ROOT = Path(__file__).resolve().parents[1]
 ASSETS_DIR = ROOT / "assets"
@@ -46,6 +48,9 @@ def cleanup_on_start():
     # También limpiamos la carpeta temp al inicio por si quedó algo de una ejecución abortada
     if TEMP_DIR.exists():
         _clear_directory(TEMP_DIR)
+
+    # El caché de tramos de render no se vacía (sirve a reintentos); solo se podan los antiguos
+    ffmpeg_render.prune_segment_cache()
     
     # --- CAMBIO: Borrar shorts anteriores en lugar de archivarlos ---
     shorts_dir = ROOT / "output" / "shorts"
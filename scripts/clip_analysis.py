@@ -0,0 +1,392 @@
+# scripts/clip_analysis.py
+"""
+Análisis visual vectorizado (NumPy) para la selección de clips.
+
+Los hashes perceptuales se guardan como enteros uint64 (un bit por celda de
+una rejilla 8x8), de modo que la distancia de Hamming entre todos los pares se
+calcula de golpe con XOR + popcount, sin bucles en Python.
+
+El resto del análisis trabaja sobre una decodificación en streaming a
+miniatura (ffmpeg -> rawvideo por pipe), con memoria acotada.
+"""
+import logging
+import subprocess
+
+import numpy as np
+
+import media_probe
+
+HASH_SIZE = 8  # Rejilla 8x8 -> 64 bits, igual que imagehash.average_hash
+
+# Decodificación de análisis: pocos FPS y miniaturas, suficiente para detectar cortes
+ANALYSIS_FPS = 4
+ANALYSIS_SIZE = (64, 36)
+SCENE_HIST_BINS = 16
+SCENE_CUT_THRESHOLD = 0.45  # Distancia de histograma (0-1) a partir de la cual hay corte
+MIN_SHOT_DURATION = 0.5     # Evita cortes dobles en flashes/fundidos rápidos
+FINGERPRINT_INTERVAL = 1.0  # Segundos entre hashes de la huella del tráiler
+
+# Puntuación de clips (una sola decodificación RGB a miniatura por clip)
+SCORE_FPS = 4
+SCORE_SIZE = (96, 54)
+HASH_TIME = 2.0              # Segundo del clip que se usa para el hash de diversidad
+DARK_MEAN, FLAT_STD = 25, 5  # Mismos umbrales que el antiguo chequeo de negros
+EDGE_THRESHOLD = 40          # Salto de luminancia que cuenta como borde
+TEXT_EDGE_DENSITY = 0.06     # Bordes típicos de un rótulo (letras nítidas sobre fondo plano)
+TEXT_MAX_COLORFULNESS = 12
+STATIC_MOTION = 0.004        # Energía de movimiento media (0-1) por debajo de la cual es un plano fijo
+
+# Tabla de popcount por byte para NumPy < 2.0 (sin np.bitwise_count)
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _to_gray(frame: np.ndarray) -> np.ndarray:
+    """Convierte un frame RGB (H, W, 3) o gris (H, W) a luminancia float32."""
+    if frame.ndim == 3:
+        return frame[..., :3].astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    return frame.astype(np.float32)
+
+
+def _block_mean(gray: np.ndarray, size: int = HASH_SIZE) -> np.ndarray:
+    """Reduce una imagen a size x size promediando bloques (recorta el resto que no divide)."""
+    h, w = gray.shape
+    bh, bw = max(1, h // size), max(1, w // size)
+    if h < size or w < size:
+        # Frames diminutos: repetimos píxeles hasta cubrir la rejilla
+        gray = np.repeat(np.repeat(gray, -(-size // h), axis=0), -(-size // w), axis=1)
+        h, w = gray.shape
+        bh, bw = h // size, w // size
+    gray = gray[:bh * size, :bw * size]
+    return gray.reshape(size, bh, size, bw).mean(axis=(1, 3))
+
+
+def average_hash(frame: np.ndarray) -> np.uint64:
+    """Hash medio de 64 bits (equivalente a imagehash.average_hash) empaquetado en un uint64."""
+    small = _block_mean(_to_gray(frame))
+    bits = (small > small.mean()).reshape(-1)
+    return np.packbits(bits).view(">u8")[0].astype(np.uint64)
+
+
+def popcount(values: np.ndarray) -> np.ndarray:
+    """Número de bits a 1 de cada elemento de un array uint64."""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values).astype(np.int32)
+    as_bytes = values.view(np.uint8).reshape(values.shape + (8,))
+    return _POPCOUNT_TABLE[as_bytes].sum(axis=-1, dtype=np.int32)
+
+
+def hamming_matrix(hashes) -> np.ndarray:
+    """Matriz N x N de distancias de Hamming entre hashes uint64."""
+    h = np.asarray(hashes, dtype=np.uint64)
+    return popcount(h[:, None] ^ h[None, :])
+
+
+def select_diverse(hashes, k: int) -> list[int]:
+    """
+    Elige k índices maximizando la distancia mínima entre los elegidos (max-min).
+
+    Heurística de punto más lejano: arranca con el par más distante y añade en
+    cada paso el candidato cuya distancia al conjunto elegido es mayor. Es la
+    aproximación clásica (factor 2) al problema max-min y cuesta O(N * k) sobre
+    la matriz precalculada. Devuelve los índices en orden temporal.
+    """
+    n = len(hashes)
+    if n <= k:
+        return list(range(n))
+    if k <= 0:
+        return []
+
+    dist = hamming_matrix(hashes)
+    if k == 1:
+        return [0]
+
+    # Sin la diagonal: con hashes todos iguales (ventanas estáticas o negras) la matriz
+    # es toda ceros y argmax devolvería (0, 0), el mismo índice dos veces
+    np.fill_diagonal(dist, -1)
+    i, j = np.unravel_index(np.argmax(dist), dist.shape)
+    chosen = [int(i), int(j)]
+    # Distancia de cada candidato al conjunto elegido
+    min_dist = np.minimum(dist[i], dist[j]).astype(np.int32)
+    min_dist[chosen] = -1
+    while len(chosen) < k:
+        nxt = int(np.argmax(min_dist))
+        chosen.append(nxt)
+        np.minimum(min_dist, dist[nxt], out=min_dist)
+        min_dist[chosen] = -1
+    return sorted(chosen)
+
+
+def min_pairwise_distance(hashes) -> int:
+    """Distancia de Hamming mínima entre cualquier par (64 si hay menos de dos hashes)."""
+    if len(hashes) < 2:
+        return HASH_SIZE * HASH_SIZE
+    dist = hamming_matrix(hashes)
+    np.fill_diagonal(dist, HASH_SIZE * HASH_SIZE)
+    return int(dist.min())
+
+
+# --- DECODIFICACIÓN EN STREAMING ---
+def video_start_offset(video_path) -> float:
+    """Segundos entre el origen del contenedor y el primer frame de vídeo (0 si no se sabe)."""
+    info = media_probe.probe(video_path)
+    if not info:
+        return 0.0
+    return max(0.0, info.get("video_start_time", 0.0) - info.get("start_time", 0.0))
+
+
+def iter_frames(video_path, fps=ANALYSIS_FPS, size=ANALYSIS_SIZE, gray=True, start=None, duration=None):
+    """
+    Decodifica el vídeo con ffmpeg a baja resolución y devuelve (t, frame) uno a uno.
+
+    Solo hay un frame en memoria a la vez, así que el consumo es constante sea cual
+    sea la duración del tráiler. `t` está en la escala de ffmpeg -ss (la que usa la
+    extracción de ventanas): si el vídeo no empieza en el origen del contenedor, el
+    primer frame lleva ese desfase en vez de 0.
+    """
+    w, h = size
+    lead = max(0.0, video_start_offset(video_path) - (start or 0.0))
+    t0 = (start or 0.0) + round(lead * fps) / fps  # El filtro fps arranca en su rejilla
+    channels = 1 if gray else 3
+    cmd = ['ffmpeg', '-v', 'error']
+    if start is not None:
+        cmd += ['-ss', str(start)]
+    cmd += ['-i', str(video_path)]
+    if duration is not None:
+        cmd += ['-t', str(duration)]
+    cmd += [
+        '-vf', f'fps={fps},scale={w}:{h}',
+        # Sin relleno inicial del muxer (depende de la versión de ffmpeg): los tiempos salen de t0
+        '-fps_mode', 'passthrough',
+        '-f', 'rawvideo',
+        '-pix_fmt', 'gray' if gray else 'rgb24',
+        '-'
+    ]
+    frame_bytes = w * h * channels
+    shape = (h, w) if gray else (h, w, 3)
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        i = 0
+        while True:
+            data = proc.stdout.read(frame_bytes)
+            if len(data) < frame_bytes:
+                break
+            yield t0 + i / fps, np.frombuffer(data, dtype=np.uint8).reshape(shape)
+            i += 1
+    finally:
+        proc.stdout.close()
+        proc.kill()
+        proc.wait()
+
+
+# --- DETECCIÓN DE ESCENAS ---
+def _gray_histogram(frame: np.ndarray) -> np.ndarray:
+    hist = np.bincount(frame.reshape(-1) >> (8 - int(np.log2(SCENE_HIST_BINS))), minlength=SCENE_HIST_BINS)
+    return hist.astype(np.float32) / max(1, frame.size)
+
+
+def analyze_trailer(video_path, threshold=SCENE_CUT_THRESHOLD, fps=ANALYSIS_FPS,
+                    fingerprint_interval=FINGERPRINT_INTERVAL) -> dict:
+    """
+    Pasada única de análisis a miniatura sobre el tráiler completo.
+
+    - Cortes duros comparando histogramas de luminancia entre frames consecutivos.
+    - Huella (fingerprint): hash medio cada `fingerprint_interval` segundos, saltando
+      frames planos (negros, fundidos) que coincidirían con cualquier tráiler.
+
+    Devuelve {"shots": [(inicio, fin)], "duration": s, "fingerprint": [uint64]}.
+    Listas vacías si ffmpeg no pudo leer el vídeo.
+    """
+    cuts = []
+    fingerprint = []
+    prev_hist = None
+    next_hash_t = 0.0
+    t = 0.0
+    n_frames = 0
+    for t, frame in iter_frames(video_path, fps=fps):
+        n_frames += 1
+        if not cuts:
+            cuts.append(t)  # El primer plano empieza con el primer frame (no siempre en 0)
+            next_hash_t = t
+        hist = _gray_histogram(frame)
+        if prev_hist is not None:
+            # Distancia L1 normalizada a [0, 1]
+            dist = 0.5 * float(np.abs(hist - prev_hist).sum())
+            if dist > threshold and t - cuts[-1] >= MIN_SHOT_DURATION:
+                cuts.append(t)
+        prev_hist = hist
+
+        if t >= next_hash_t:
+            next_hash_t += fingerprint_interval
+            if frame.std() >= FLAT_STD:
+                fingerprint.append(average_hash(frame))
+
+    if n_frames == 0:
+        logging.warning(f"No se pudo decodificar {video_path} para analizarlo.")
+        return {"shots": [], "duration": 0.0, "fingerprint": []}
+
+    duration = t + 1.0 / fps
+    shots = [(a, b) for a, b in zip(cuts, cuts[1:] + [duration])]
+    return {"shots": shots, "duration": duration, "fingerprint": fingerprint}
+
+
+def detect_shots(video_path, threshold=SCENE_CUT_THRESHOLD, fps=ANALYSIS_FPS):
+    """Atajo de analyze_trailer: devuelve (shots, duration)."""
+    analysis = analyze_trailer(video_path, threshold, fps)
+    return analysis["shots"], analysis["duration"]
+
+
+# --- PUNTUACIÓN MULTIMÉTRICA ---
+def score_frames(frames: np.ndarray, fps: float = SCORE_FPS) -> dict:
+    """
+    Calcula todas las métricas de un clip en una pasada vectorizada sobre (T, H, W, 3).
+
+    - Luminancia: media, desviación y proporción de frames negros/planos.
+    - Densidad de bordes: los rótulos de texto tienen muchos bordes y poco color.
+    - Energía de movimiento: diferencia media entre frames consecutivos.
+    - Colorido: métrica de Hasler-Süsstrunk.
+    """
+    rgb = frames.astype(np.float32)
+    luma = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)  # (T, H, W)
+
+    frame_mean = luma.mean(axis=(1, 2))
+    frame_std = luma.std(axis=(1, 2))
+    dark_ratio = float(np.mean((frame_mean < DARK_MEAN) | (frame_std < FLAT_STD)))
+
+    gx = np.abs(np.diff(luma, axis=2))[:, :-1, :]
+    gy = np.abs(np.diff(luma, axis=1))[:, :, :-1]
+    edge_density = float(np.mean(np.maximum(gx, gy) > EDGE_THRESHOLD))
+
+    motion = float(np.abs(np.diff(luma, axis=0)).mean() / 255.0) if len(luma) > 1 else 0.0
+
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    rg = r - g
+    yb = 0.5 * (r + g) - b
+    colorfulness = (np.sqrt(rg.std(axis=(1, 2)) ** 2 + yb.std(axis=(1, 2)) ** 2)
+                    + 0.3 * np.sqrt(rg.mean(axis=(1, 2)) ** 2 + yb.mean(axis=(1, 2)) ** 2))
+    colorfulness = float(colorfulness.mean())
+
+    is_black = dark_ratio > 0.3
+    is_text_card = edge_density > TEXT_EDGE_DENSITY and colorfulness < TEXT_MAX_COLORFULNESS and motion < 2 * STATIC_MOTION
+    is_static = motion < STATIC_MOTION
+
+    # Nota 0-1: movimiento, contraste y color; los rechazados puntúan 0
+    score = (0.4 * min(motion / 0.05, 1.0)
+             + 0.3 * min(float(frame_std.mean()) / 64.0, 1.0)
+             + 0.3 * min(colorfulness / 60.0, 1.0))
+    if is_black or is_text_card or is_static:
+        score = 0.0
+
+    hash_idx = min(len(frames) - 1, int(HASH_TIME * fps))
+    return {
+        "luma_mean": round(float(frame_mean.mean()), 2),
+        "luma_std": round(float(frame_std.mean()), 2),
+        "dark_ratio": round(dark_ratio, 3),
+        "edge_density": round(edge_density, 4),
+        "motion": round(motion, 4),
+        "colorfulness": round(colorfulness, 2),
+        "is_black": is_black,
+        "is_text_card": is_text_card,
+        "is_static": is_static,
+        "score": round(score, 4),
+        "hash": f"{int(average_hash(frames[hash_idx])):016x}",
+    }
+
+
+def score_clip(video_path, fps=SCORE_FPS, size=SCORE_SIZE) -> dict | None:
+    """Decodifica un clip una vez a miniatura RGB y devuelve su fila de métricas."""
+    frames = [frame for _, frame in iter_frames(video_path, fps=fps, size=size, gray=False)]
+    if not frames:
+        logging.warning(f"No se pudo decodificar {video_path} para puntuarlo.")
+        return None
+    return score_frames(np.stack(frames), fps=fps)
+
+
+# --- RECORTE INTELIGENTE (saliencia) ---
+CROP_FPS = 6
+CROP_SIZE = (96, 54)
+CROP_MOTION_WEIGHT = 2.0     # El movimiento pesa más que los bordes estáticos (fondos con textura)
+CROP_CENTER_SIGMA = 0.35     # Sesgo suave hacia el centro (fracción del ancho)
+CROP_SMOOTH_SECONDS = 1.0    # Ventana de suavizado dentro de cada plano
+CROP_MAX_PAN = 0.12          # Desplazamiento máximo del centro por segundo (fracción del ancho)
+CROP_KEY_SECONDS = 1.0       # Un punto de control por segundo (interpolación lineal entre ellos)
+CROP_CUT_DIFF = 0.18         # Diferencia media entre frames (0-1) que se considera corte de plano
+CROP_MIN_ENERGY = 1.0        # Por debajo (energía media por píxel), el frame no decide: centro
+
+
+def saliency_centroids(frames: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Centro horizontal de interés (0-1) de cada frame de (T, H, W) en gris, y dónde hay cortes.
+
+    Energía por columna = gradiente espacial + CROP_MOTION_WEIGHT x diferencia temporal,
+    ponderada por una campana centrada. Devuelve (centros, máscara de corte por frame).
+    """
+    luma = frames.astype(np.float32)
+    t, h, w = luma.shape
+    grad = np.zeros_like(luma)
+    grad[:, :, 1:] += np.abs(np.diff(luma, axis=2))
+    grad[:, 1:, :] += np.abs(np.diff(luma, axis=1))
+    motion = np.zeros_like(luma)
+    if t > 1:
+        motion[1:] = np.abs(np.diff(luma, axis=0))
+        motion[0] = motion[1]
+
+    diff = motion.mean(axis=(1, 2)) / 255.0
+    cuts = diff > CROP_CUT_DIFF
+    motion[cuts] = 0.0  # En un corte la "energía de movimiento" es todo el frame: no informa
+
+    energy = (grad + CROP_MOTION_WEIGHT * motion).sum(axis=1)  # (T, W)
+    x = (np.arange(w, dtype=np.float32) + 0.5) / w
+    energy *= np.exp(-0.5 * ((x - 0.5) / CROP_CENTER_SIGMA) ** 2)
+    total = energy.sum(axis=1)
+    centroids = np.where(total > CROP_MIN_ENERGY * h * w,
+                         (energy * x).sum(axis=1) / np.maximum(total, 1e-6), 0.5)
+    return centroids, cuts
+
+
+def smooth_crop_path(centroids: np.ndarray, cuts: np.ndarray, fps: float) -> np.ndarray:
+    """Media móvil por plano (sin mezclar planos) y límite de velocidad de paneo."""
+    path = np.empty_like(centroids)
+    bounds = [0] + [int(i) for i in np.flatnonzero(cuts) if i > 0] + [len(centroids)]
+    win = max(1, int(round(CROP_SMOOTH_SECONDS * fps)))
+    max_step = CROP_MAX_PAN / fps
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        shot = centroids[a:b]
+        k = min(win, len(shot))
+        padded = np.pad(shot, (k // 2, k - 1 - k // 2), mode="edge")
+        smooth = np.convolve(padded, np.ones(k) / k, mode="valid")
+        # Paneo limitado: un plano nunca "persigue" el ruido a saltos
+        for i in range(1, len(smooth)):
+            smooth[i] = smooth[i - 1] + np.clip(smooth[i] - smooth[i - 1], -max_step, max_step)
+        path[a:b] = smooth
+    return path
+
+
+def crop_path(video_path, duration: float, fps=CROP_FPS, size=CROP_SIZE) -> list | None:
+    """
+    Trayectoria del centro del recorte para un clip: [[t, centro_x (0-1 del ancho)], ...].
+
+    Se analiza a miniatura (CROP_SIZE) y pocos FPS, así que cuesta décimas de segundo por clip.
+    Entre puntos se interpola linealmente; en un corte de plano hay dos puntos casi
+    coincidentes para que el recorte salte en vez de barrer.
+    """
+    frames = [frame for _, frame in iter_frames(video_path, fps=fps, size=size, gray=True, duration=duration)]
+    if len(frames) < 2:
+        logging.warning(f"No se pudo analizar {video_path} para el recorte inteligente.")
+        return None
+    centroids, cuts = saliency_centroids(np.stack(frames))
+    path = smooth_crop_path(centroids, cuts, fps)
+
+    step = max(1, int(round(CROP_KEY_SECONDS * fps)))
+    keys = set(range(0, len(path), step)) | {len(path) - 1}
+    for i in np.flatnonzero(cuts):
+        if i > 0:
+            keys |= {int(i) - 1, int(i)}
+    points = []
+    for i in sorted(keys):
+        t = i / fps
+        if cuts[i] and i > 0:
+            t -= 0.5 / fps  # El salto ocurre entre los dos frames del corte
+        points.append([round(t, 3), round(float(path[i]), 4)])
+    points[-1][0] = round(max(points[-1][0], duration), 3)
+    return points
@@ -0,0 +1,189 @@
+# scripts/compositor.py
+"""
+Compositor NumPy mínimo para capas superpuestas (textos, logos, insignias) sobre el vídeo.
+
+En vez de un CompositeVideoClip de moviepy (arrays nuevos por capa y por frame):
+  - Un único buffer de salida por tamaño de frame, reservado una vez.
+  - Cada capa RGBA se precalcula al cargarla (color premultiplicado por alfa y 255 - alfa)
+    y se mezcla en su sitio dentro del buffer, con un buffer de trabajo propio.
+  - Los frames llegan de un ffmpeg (rawvideo rgb24 por stdout) con readinto() sobre el
+    buffer y salen hacia el ffmpeg codificador por stdin sin copias intermedias.
+
+Las capas se describen en la línea de tiempo como dicts serializables, con posición y
+ancho relativos al frame para que valgan igual en el render final y en el borrador:
+    {"path": "x.png", "x": 0.1, "y": 0.8, "width": 0.8, "start": 0.0, "end": 4.0}
+(x, y = esquina superior izquierda; width opcional, si falta se usa el tamaño del PNG).
+Las fracciones se refieren al 9:16: en otros formatos el ancho se toma del lado corto y
+se conserva el centro horizontal (ver layer_geometry).
+o se crean desde un array con Layer(rgba, x, y, start, end) en píxeles.
+"""
+import logging
+import subprocess
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+
+def _box_blur(img: np.ndarray, radius: int) -> np.ndarray:
+    """Box blur separable con sumas acumuladas (coste independiente del radio), bordes repetidos."""
+    out = img.astype(np.float32)
+    k = 2 * radius + 1
+    for axis in (0, 1):
+        pad = [(0, 0)] * out.ndim
+        pad[axis] = (radius + 1, radius)
+        c = np.cumsum(np.pad(out, pad, mode="edge"), axis=axis)
+        hi = np.take(c, np.arange(k, c.shape[axis]), axis=axis)
+        lo = np.take(c, np.arange(0, c.shape[axis] - k), axis=axis)
+        out = (hi - lo) / k
+    return out
+
+
+def blur_fill(frame: np.ndarray, out_w: int, out_h: int, downscale: int = 8, radius: int = 4,
+              brightness: float = -0.12) -> np.ndarray:
+    """
+    Fondo desenfocado (uint8 RGB out_h x out_w) a partir de un frame: se escala para cubrir
+    el destino a 1/downscale de resolución, se desenfoca ahí (dos pasadas de caja ~ gaussiano)
+    y se reescala. Mismo resultado aproximado que ffmpeg_render.blur_fill_filter.
+    """
+    lw, lh = max(2, out_w // downscale), max(2, out_h // downscale)
+    src_h, src_w = frame.shape[:2]
+    scale = max(lw / src_w, lh / src_h)
+    cw, ch = lw / scale, lh / scale  # Zona del frame que cubre el destino
+    box = ((src_w - cw) / 2, (src_h - ch) / 2, (src_w + cw) / 2, (src_h + ch) / 2)
+    low = np.asarray(Image.fromarray(frame[..., :3]).resize((lw, lh), Image.BILINEAR, box=box))
+    low = _box_blur(_box_blur(low, radius), radius) + brightness * 255
+    low = np.clip(low, 0, 255).astype(np.uint8)
+    return np.asarray(Image.fromarray(low).resize((out_w, out_h), Image.BILINEAR))
+
+
+def layer_geometry(spec: dict, frame_w: int, frame_h: int, img_w: int) -> tuple[int, int, int]:
+    """(x, y, ancho) en píxeles de una capa en un frame de cualquier formato."""
+    short = min(frame_w, frame_h)
+    w = max(1, round(spec["width"] * short)) if spec.get("width") else img_w
+    center = spec.get("x", 0.0) + (spec["width"] if spec.get("width") else img_w / short) / 2
+    x = round(center * frame_w - w / 2)
+    y = round(spec.get("y", 0.0) * frame_h)
+    return x, y, w
+
+
+class Layer:
+    """Imagen RGBA fija en (x, y) visible en [start, end) segundos de la línea de tiempo."""
+
+    def __init__(self, rgba: np.ndarray, x: int = 0, y: int = 0, start: float = 0.0, end: float | None = None):
+        rgba = np.ascontiguousarray(rgba, dtype=np.uint8)
+        if rgba.ndim != 3 or rgba.shape[2] != 4:
+            raise ValueError(f"La capa debe ser RGBA (alto, ancho, 4), no {rgba.shape}")
+        self.rgba = rgba
+        self.x, self.y = int(x), int(y)
+        self.start = float(start)
+        self.end = float("inf") if end is None else float(end)
+        self._prepared_for = None
+
+    @classmethod
+    def from_spec(cls, spec: dict, frame_w: int, frame_h: int) -> "Layer":
+        """Carga el PNG de una capa de la línea de tiempo y lo escala al frame (una vez)."""
+        img = Image.open(spec["path"]).convert("RGBA")
+        x, y, w = layer_geometry(spec, frame_w, frame_h, img.width)
+        if w != img.width:
+            img = img.resize((w, max(1, round(img.height * w / img.width))), Image.LANCZOS)
+        return cls(np.asarray(img), x, y, spec.get("start", 0.0), spec.get("end"))
+
+    def active(self, t: float) -> bool:
+        return self.start <= t < self.end
+
+    def overlaps(self, t0: float, t1: float) -> bool:
+        return self.start < t1 and self.end > t0
+
+    def prepare(self, frame_w: int, frame_h: int):
+        """Recorta la capa al frame y precalcula los términos de la mezcla (una sola vez)."""
+        if self._prepared_for == (frame_w, frame_h):
+            return
+        h, w = self.rgba.shape[:2]
+        x0, y0 = max(0, self.x), max(0, self.y)
+        x1, y1 = min(frame_w, self.x + w), min(frame_h, self.y + h)
+        self.box = (y0, y1, x0, x1)
+        if x1 <= x0 or y1 <= y0:
+            self.visible = False
+            self._prepared_for = (frame_w, frame_h)
+            return
+        crop = self.rgba[y0 - self.y:y1 - self.y, x0 - self.x:x1 - self.x]
+        alpha = crop[..., 3:4].astype(np.uint16)
+        self.inv_alpha = 255 - alpha
+        # + 127 para redondear al dividir entre 255
+        self.premul = crop[..., :3].astype(np.uint16) * alpha + 127
+        self.scratch = np.empty(self.premul.shape, dtype=np.uint16)
+        self.visible = bool(alpha.any())
+        self._prepared_for = (frame_w, frame_h)
+
+    def blit(self, frame: np.ndarray):
+        """Mezcla la capa sobre `frame` (uint8 RGB) en su sitio."""
+        if not self.visible:
+            return
+        y0, y1, x0, x1 = self.box
+        region = frame[y0:y1, x0:x1]
+        np.multiply(region, self.inv_alpha, out=self.scratch)
+        self.scratch += self.premul
+        self.scratch //= 255
+        np.copyto(region, self.scratch, casting="unsafe")
+
+
+class Compositor:
+    """Mezcla capas sobre un flujo de frames usando un único buffer preasignado."""
+
+    def __init__(self, width: int, height: int, layers: list):
+        self.width, self.height = width, height
+        self.frame = np.empty((height, width, 3), dtype=np.uint8)
+        self._view = memoryview(self.frame).cast("B")
+        self.layers = layers
+        self.encoder_log = ""  # stderr del último codificador de pipe()
+        for layer in layers:
+            layer.prepare(width, height)
+
+    def compose(self, t: float) -> np.ndarray:
+        for layer in self.layers:
+            if layer.active(t):
+                layer.blit(self.frame)
+        return self.frame
+
+    def _read_frame(self, stream) -> bool:
+        """Llena el buffer con el siguiente frame. False al final del flujo."""
+        filled, size = 0, len(self._view)
+        while filled < size:
+            n = stream.readinto(self._view[filled:])
+            if not n:
+                if filled:
+                    logging.warning(f"Frame incompleto al final del flujo ({filled}/{size} bytes).")
+                return False
+            filled += n
+        return True
+
+    def pipe(self, decode_cmd: list, encode_cmd: list, start_time: float, fps: float) -> int:
+        """
+        Lee frames rgb24 de `decode_cmd`, mezcla las capas y los escribe en `encode_cmd`.
+
+        `start_time` es el instante (en la línea de tiempo) del primer frame. Devuelve el
+        número de frames escritos; lanza RuntimeError si algún ffmpeg falla.
+        """
+        # stderr a fichero: una tubería llena bloquearía al codificador mientras le escribimos
+        with tempfile.TemporaryFile() as err:
+            decoder = subprocess.Popen(decode_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            encoder = subprocess.Popen(encode_cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=err)
+            count = 0
+            try:
+                while self._read_frame(decoder.stdout):
+                    self.compose(start_time + count / fps)
+                    encoder.stdin.write(self._view)
+                    count += 1
+            finally:
+                decoder.stdout.close()
+                encoder.stdin.close()
+                decoder.wait()
+                encoder.wait()
+            err.seek(0)
+            enc_err = err.read().decode("utf-8", "replace")
+        self.encoder_log = enc_err
+        if decoder.returncode != 0 or encoder.returncode != 0:
+            tail = "\n".join(enc_err.strip().splitlines()[-8:])
+            raise RuntimeError(f"Compositor: ffmpeg falló (decod {decoder.returncode}, codif {encoder.returncode}):\n{tail}")
+        return count
@@ -0,0 +1,232 @@
+# scripts/encoder_autotune.py
+"""
+Autoajuste del codificador x264 según la máquina y un presupuesto de tiempo de render.
+
+  python scripts/encoder_autotune.py            # mide presets x hilos y guarda el perfil del host
+  python scripts/encoder_autotune.py --show     # muestra el perfil guardado y la elección actual
+
+La medida usa un clip sintético (testsrc2 + grano) al tamaño de salida, codificado con los
+mismos parámetros que el render (ffmpeg_render.video_encode_args). El perfil se guarda por
+nombre de host en output/state/encoder_profiles.json; build_short elige después el preset
+de más calidad cuyo tiempo estimado cabe en RENDER_TIME_BUDGET (y cuántos procesos en
+paralelo usar). Sin perfil, se queda con los valores por defecto.
+
+También ofrece un modo de baja prioridad (nice/ionice en Linux/macOS, BELOW_NORMAL en
+Windows) para renderizar en máquinas compartidas sin molestar.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import ffmpeg_render
+import output_policy
+
+ROOT = Path(__file__).resolve().parents[1]
+STATE_DIR = ROOT / "output" / "state"
+PROFILE_FILE = STATE_DIR / "encoder_profiles.json"
+BENCH_DIR = ROOT / "temp" / "autotune"
+
+# De más rápido a más lento (= más calidad por bit)
+PRESETS = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow"]
+BENCH_SECONDS = 2.0
+SAFETY_FACTOR = 1.3   # Filtros, decodificación y capas no entran en la medida
+
+BELOW_NORMAL_PRIORITY_CLASS = 0x00004000
+_priority_lowered = False
+
+
+def host_name() -> str:
+    return socket.gethostname() or "desconocido"
+
+
+def thread_options() -> list:
+    cpu = os.cpu_count() or 1
+    return sorted({1, max(1, cpu // 2), cpu})
+
+
+def _make_reference(width: int, height: int, fps_expr: str) -> Path:
+    """Clip de referencia sin pérdidas (se genera una vez por tamaño)."""
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    ref = BENCH_DIR / f"ref_{width}x{height}.mkv"
+    if not ref.exists():
+        ffmpeg_render.run_ffmpeg([
+            'ffmpeg', '-y', '-hide_banner',
+            '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate={fps_expr}:duration={BENCH_SECONDS}',
+            '-vf', 'noise=alls=12:allf=t',
+            '-c:v', 'ffv1', '-pix_fmt', 'yuv420p', str(ref)
+        ], "Clip de referencia")
+    return ref
+
+
+def _ssim(encoded: Path, reference: Path) -> float | None:
+    err = ffmpeg_render.run_ffmpeg([
+        'ffmpeg', '-hide_banner', '-i', str(encoded), '-i', str(reference),
+        '-lavfi', '[0:v][1:v]ssim', '-f', 'null', '-'
+    ], "SSIM")
+    m = re.search(r"All:([\d.]+)", err)
+    return float(m.group(1)) if m else None
+
+
+def benchmark(width: int = output_policy.MAX_OUTPUT_WIDTH, src_fps: float = output_policy.DEFAULT_FPS) -> dict:
+    """Mide cada preset con cada número de hilos y devuelve el perfil del host."""
+    height = int(width * 16 / 9) // 2 * 2
+    fps, fps_expr = output_policy.choose_fps(src_fps)
+    ref = _make_reference(width, height, fps_expr)
+    frames = math.ceil(BENCH_SECONDS * fps)
+    timeline = {**output_policy.rate_control(width, height, fps), "fps_expr": fps_expr}
+
+    results = []
+    for preset in PRESETS:
+        for threads in thread_options():
+            out = BENCH_DIR / f"enc_{preset}_{threads}.mp4"
+            cmd = ['ffmpeg', '-y', '-hide_banner', '-i', str(ref),
+                   *ffmpeg_render.video_encode_args({**timeline, "preset": preset}),
+                   '-threads', str(threads), '-an', str(out)]
+            t0 = time.perf_counter()
+            ffmpeg_render.run_ffmpeg(cmd, f"Preset {preset}")
+            elapsed = time.perf_counter() - t0
+            row = {
+                "preset": preset,
+                "threads": threads,
+                "fps": round(frames / elapsed, 2),
+                "ssim": _ssim(out, ref),
+                "size_kb": round(out.stat().st_size / 1024, 1),
+            }
+            results.append(row)
+            logging.info(f"   {preset:<10} {threads:>2} hilos: {row['fps']:7.2f} fps, SSIM {row['ssim']}, {row['size_kb']} KB")
+            out.unlink(missing_ok=True)
+
+    return {
+        "host": host_name(),
+        "cpu_count": os.cpu_count(),
+        "measured_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        "resolution": [width, height],
+        "fps": fps_expr,
+        "results": results,
+    }
+
+
+def _load_profiles() -> dict:
+    if not PROFILE_FILE.exists():
+        return {}
+    try:
+        return json.loads(PROFILE_FILE.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        logging.error(f"Error al decodificar {PROFILE_FILE}, se tratará como vacío.")
+        return {}
+
+
+def save_profile(profile: dict):
+    try:
+        STATE_DIR.mkdir(parents=True, exist_ok=True)
+        profiles = _load_profiles()
+        profiles[profile["host"]] = profile
+        PROFILE_FILE.write_text(json.dumps(profiles, ensure_ascii=False, indent=2), encoding="utf-8")
+    except Exception as e:
+        logging.error(f"Error al guardar perfil de codificador: {e}")
+
+
+def load_profile(host: str | None = None) -> dict | None:
+    return _load_profiles().get(host or host_name())
+
+
+def choose(profile: dict, frames: int, width: int, height: int, budget: float) -> dict | None:
+    """
+    Preset de más calidad cuyo tiempo estimado cabe en `budget` segundos.
+
+    Con `t` hilos por proceso el render lanza cpu // t procesos en paralelo, así que el
+    rendimiento total estimado es fps(t) * cpu // t. Las fps medidas se escalan por píxeles
+    si la salida no tiene el tamaño del perfil. Devuelve {"preset", "workers", "estimated_s"}.
+    """
+    cpu = profile.get("cpu_count") or os.cpu_count() or 1
+    pw, ph = profile["resolution"]
+    pixel_scale = (pw * ph) / (width * height)
+
+    best_per_preset = {}
+    for row in profile["results"]:
+        workers = max(1, cpu // row["threads"])
+        throughput = row["fps"] * pixel_scale * workers
+        estimated = frames / throughput * SAFETY_FACTOR if throughput > 0 else float("inf")
+        current = best_per_preset.get(row["preset"])
+        if current is None or estimated < current["estimated_s"]:
+            best_per_preset[row["preset"]] = {"preset": row["preset"], "workers": workers,
+                                              "estimated_s": round(estimated, 1)}
+
+    for preset in reversed(PRESETS):
+        choice = best_per_preset.get(preset)
+        if choice and choice["estimated_s"] <= budget:
+            return choice
+    # Nada cabe: lo más rápido que haya
+    fastest = [best_per_preset[p] for p in PRESETS if p in best_per_preset]
+    return fastest[0] if fastest else None
+
+
+def tune(timeline: dict, budget: float) -> dict:
+    """Aplica el perfil del host a la línea de tiempo (preset y procesos en paralelo)."""
+    profile = load_profile()
+    if not profile:
+        logging.info("ℹ️ Sin perfil de codificador para este equipo (python scripts/encoder_autotune.py). Ajustes por defecto.")
+        return timeline
+    frames = math.ceil(ffmpeg_render.timeline_duration(timeline) * timeline["fps"])
+    choice = choose(profile, frames, timeline["width"], timeline["height"], budget)
+    if not choice:
+        return timeline
+    logging.info(f"🎛️ Autotune: preset '{choice['preset']}' con {choice['workers']} procesos "
+                 f"(~{choice['estimated_s']}s estimados, presupuesto {budget:.0f}s).")
+    return {**timeline, "preset": choice["preset"], "workers": choice["workers"]}
+
+
+def lower_process_priority():
+    """Baja la prioridad de CPU (y de E/S en Linux) de este proceso; los ffmpeg hijos la heredan."""
+    global _priority_lowered
+    if _priority_lowered:
+        return  # os.nice() es acumulativo
+    _priority_lowered = True
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            ctypes.windll.kernel32.SetPriorityClass(handle, BELOW_NORMAL_PRIORITY_CLASS)
+        else:
+            os.nice(10)
+            if shutil.which("ionice"):
+                subprocess.run(['ionice', '-c', '2', '-n', '7', '-p', str(os.getpid())],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        logging.info("🐢 Modo baja prioridad activado.")
+    except Exception as e:
+        logging.warning(f"No se pudo bajar la prioridad del proceso: {e}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    parser = argparse.ArgumentParser(description="Autoajuste de x264 para este equipo")
+    parser.add_argument("--show", action="store_true", help="Mostrar el perfil guardado sin medir")
+    parser.add_argument("--width", type=int, default=output_policy.MAX_OUTPUT_WIDTH, help="Ancho de salida a medir")
+    parser.add_argument("--budget", type=float, default=180.0, help="Presupuesto (s) para la elección de ejemplo")
+    args = parser.parse_args()
+
+    if args.show:
+        profile = load_profile()
+        if not profile:
+            print(f"Sin perfil para {host_name()}.")
+            sys.exit(1)
+    else:
+        logging.info(f"⏱️ Midiendo x264 en {host_name()} ({os.cpu_count()} CPUs)...")
+        profile = benchmark(args.width)
+        save_profile(profile)
+        shutil.rmtree(BENCH_DIR, ignore_errors=True)
+        logging.info(f"✅ Perfil guardado en {PROFILE_FILE}")
+
+    w, h = profile["resolution"]
+    frames = math.ceil(28 * 30)  # Short típico: ~28 s a 30 fps
+    print("Elección para un Short de 28 s:", choose(profile, frames, w, h, args.budget))
@@ -17,10 +17,15 @@ import unicodedata
 import re
 import time
 import subprocess
-from moviepy import VideoFileClip
-from PIL import Image
-import imagehash
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import clip_analysis
+import trailer_probe
+import trailer_fingerprint
+import movie_utils
+import media_probe
+import output_policy
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
@@ -42,6 +47,45 @@ SKIP_FINAL_CLIPS = 2  # Saltamos los últimos 12 segundos aprox (créditos/fecha
 
 HASH_SIMILARITY_THRESHOLD = 5
 
+# Procesos ffmpeg simultáneos en la extracción (cada uno es un proceso aparte, el GIL no estorba)
+EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
+
+# Modo de extracción: "reencode" (libx264 ultrafast, FPS según output_policy) o "copy" (corte en keyframe sin recodificar).
+# Los clips son solo materia prima para build_short, que vuelve a codificar; en modo copy
+# nos ahorramos la primera codificación y su pérdida de calidad.
+EXTRACT_MODE = "reencode"
+KEYFRAME_SNAP_TOLERANCE = 1.5  # Segundos máximos que movemos una ventana para caer en un keyframe
+
+# Formato intermedio de los clips recodificados. Más disco a cambio de decodificar y
+# buscar más rápido en build_short y de no perder calidad en una segunda generación.
+#   "x264"       -> GOP largo, crf 20 (el histórico, el más pequeño)
+#   "x264_intra" -> todo intra (-g 1), cada frame se decodifica solo
+#   "ffv1"       -> sin pérdidas, intra, en .mkv (el más grande)
+# Comparativa: python scripts/bench_render.py intermediate
+INTERMEDIATE_FORMAT = "x264"
+INTERMEDIATE_FORMATS = {
+    "x264": {"ext": ".mp4", "args": ['-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '20', '-pix_fmt', 'yuv420p']},
+    "x264_intra": {"ext": ".mp4", "args": ['-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '16', '-g', '1', '-pix_fmt', 'yuv420p']},
+    "ffv1": {"ext": ".mkv", "args": ['-c:v', 'ffv1', '-level', '3', '-g', '1', '-slices', '4', '-pix_fmt', 'yuv420p']},
+}
+
+# Colocación de ventanas: "scenes" (dentro de planos detectados) o "grid" (rejilla uniforme)
+WINDOW_MODE = "scenes"
+SHOT_START_OFFSET = 0.2  # Margen tras el corte para no arrancar en el frame de transición
+
+# Modo de descarga:
+#   "full"        -> tráiler completo a 1080p y después extracción
+#   "sections"    -> versión ligera para analizar + solo las ventanas elegidas a calidad completa
+#   "progressive" -> un único stream de vídeo; se extraen ventanas mientras se descarga
+DOWNLOAD_MODE = "full"
+FULL_FORMAT = 'bestvideo[height<=1080]+bestaudio/best'
+ANALYSIS_FORMAT = 'bestvideo[height<=360]/best[height<=360]/worst'
+SECTION_FORMAT = 'bestvideo[height<=1080]/best[height<=1080]/best'
+PROGRESSIVE_FORMAT = 'bestvideo[height<=1080][ext=mp4]/bestvideo[height<=1080]/best[height<=1080]'
+PROGRESSIVE_MARGIN = 0.1  # Fracción de lo descargado que no damos por decodificable (bitrate no uniforme)
+PROGRESSIVE_POLL = 0.5    # Segundos entre comprobaciones del progreso
+PROGRESSIVE_DURATION_TOLERANCE = 0.25  # Segundos que puede faltarle a una ventana leída durante la descarga
+
 def slugify(text: str, maxlen: int = 60) -> str:
     s = (text or "").lower().strip()
     s = unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
@@ -50,43 +94,33 @@ def slugify(text: str, maxlen: int = 60) -> str:
     return (s or "title")[:maxlen]
 
 def get_video_info(video_path):
-    """Obtiene FPS y resolución de un video usando ffprobe."""
-    try:
-        cmd = [
-            'ffprobe', '-v', 'error', 
-            '-select_streams', 'v:0', 
-            '-show_entries', 'stream=r_frame_rate,width,height', 
-            '-of', 'json', 
-            str(video_path)
-        ]
-        output = subprocess.check_output(cmd).decode('utf-8')
-        data = json.loads(output)
-        stream = data['streams'][0]
-        
-        # FPS
-        fps_str = stream['r_frame_rate']
-        if '/' in fps_str:
-            num, den = map(int, fps_str.split('/'))
-            fps = num / den
-        else:
-            fps = float(fps_str)
-            
-        return fps, int(stream['width']), int(stream['height'])
-    except Exception as e:
-        logging.warning(f"No se pudo detectar info con ffprobe: {e}")
+    """Obtiene FPS y resolución de un video (sondeo ffprobe compartido, ver media_probe)."""
+    info = media_probe.probe(video_path)
+    if not info or not info.get("width"):
+        logging.warning(f"No se pudo detectar info con ffprobe de {Path(video_path).name}")
         return 30.0, 1920, 1080
+    return info["fps"] or 30.0, info["width"], info["height"]
 
-def download_trailer(url, tmdb_id, slug):
-    """Descarga el tráiler directamente a la carpeta assets/trailers."""
-    trailer_filename_template = f"{tmdb_id}_{slug}_trailer.%(ext)s"
-    trailer_path_template = TRAILERS_DIR / trailer_filename_template
-    
-    # Estrategia dinámica de descarga
-    # ... (ydl_opts remain same)
-    ydl_opts = {
-        'outtmpl': str(trailer_path_template),
-        'format': 'bestvideo[height<=1080]+bestaudio/best',  
-        'format_sort': ['res:1080', 'vcodec:vp9'], 
+def get_keyframes(video_path):
+    """Devuelve los instantes (s) de los keyframes de vídeo (leídos una vez y cacheados)."""
+    info = media_probe.probe(video_path, keyframes=True)
+    return info.get("keyframes", []) if info else []
+
+def snap_to_keyframe(start_time, keyframes, tolerance=KEYFRAME_SNAP_TOLERANCE):
+    """Busca el keyframe más cercano a start_time. Devuelve None si ninguno cae dentro de la tolerancia."""
+    if not keyframes:
+        return None
+    idx = int(np.searchsorted(keyframes, start_time))
+    nearby = [keyframes[j] for j in (idx - 1, idx) if 0 <= j < len(keyframes)]
+    best = min(nearby, key=lambda k: abs(k - start_time))
+    return best if abs(best - start_time) <= tolerance else None
+
+def _ydl_opts(outtmpl, fmt=FULL_FORMAT, max_height=1080):
+    """Opciones base de yt-dlp compartidas por todas las descargas."""
+    return {
+        'outtmpl': str(outtmpl),
+        'format': fmt,
+        'format_sort': [f'res:{max_height}', 'vcodec:vp9'],
         'prefer_free_formats': True,
         'merge_output_format': 'mp4',
         'no_playlist': True,
@@ -100,15 +134,43 @@ def download_trailer(url, tmdb_id, slug):
         'fragment_retries': 5,
         'log_level': 'error',
     }
-    
-    # 1. Intentar con archivo de cookies si existe
+
+def _auth_opts(url):
+    """Opciones de autenticación para yt-dlp según el sondeo cacheado (o cookies.txt si no lo hay)."""
+    probe = trailer_probe.probe(url)
+    if probe.get("ok"):
+        return trailer_probe.strategy_opts(probe["strategy"])
     cookies_path = ROOT / "www.youtube.com_cookies.txt"
-    if cookies_path.exists():
-         ydl_opts['cookiefile'] = str(cookies_path)
+    return {'cookiefile': str(cookies_path)} if cookies_path.exists() else {}
+
+def download_trailer(url, tmdb_id, slug, fmt=FULL_FORMAT, suffix="trailer", max_height=1080):
+    """Descarga el tráiler directamente a la carpeta assets/trailers.
+
+    Con `fmt`/`suffix` se puede pedir otra variante (p.ej. la versión ligera de análisis).
+    """
+    trailer_filename_template = f"{tmdb_id}_{slug}_{suffix}.%(ext)s"
+    trailer_path_template = TRAILERS_DIR / trailer_filename_template
+    
+    # Estrategia dinámica de descarga
+    ydl_opts = _ydl_opts(trailer_path_template, fmt, max_height)
+    
+    # 0. Sondeo previo (cacheado): estrategia de cookies y formato correctos a la primera
+    probe = trailer_probe.probe(url)
+    if probe.get("ok"):
+        ydl_opts.update(trailer_probe.strategy_opts(probe["strategy"]))
+        format_ids = trailer_probe.pick_format(probe, max_height) if fmt == FULL_FORMAT else None
+        if format_ids:
+            ydl_opts['format'] = f"{format_ids}/{fmt}"
+        logging.info(f"🔎 Estrategia según sondeo: '{probe['strategy']}' (formato {ydl_opts['format'].split('/')[0]}).")
+    else:
+        # 1. Intentar con archivo de cookies si existe
+        cookies_path = ROOT / "www.youtube.com_cookies.txt"
+        if cookies_path.exists():
+             ydl_opts['cookiefile'] = str(cookies_path)
     
     def find_downloaded_file(tmdb_id):
-        # Busca específicamente el archivo que termine en _trailer en la carpeta de trailers
-        for f in TRAILERS_DIR.glob(f"{tmdb_id}_*_trailer.*"):
+        # Busca específicamente el archivo que termine en _{suffix} en la carpeta de trailers
+        for f in TRAILERS_DIR.glob(f"{tmdb_id}_*_{suffix}.*"):
             if f.suffix in ['.mp4', '.webm', '.mkv']:
                 return f
         return None
@@ -179,140 +241,292 @@ def download_trailer(url, tmdb_id, slug):
     except Exception as e:
         logging.error(f"Fallo general en descarga: {e}")
         return None
-    
-    # Informar resolución y tamaño
-    try:
-        with VideoFileClip(str(trailer_path)) as clip:
-            width, height = clip.size
-            logging.info(f"Tráiler guardado en: {trailer_path.relative_to(ROOT)}")
-            logging.info(f"✅ Resolución del tráiler descargado: {width}x{height}, Tamaño: {trailer_path.stat().st_size / (1024*1024):.2f} MB")
-    except Exception as e:
-        logging.warning(f"No se pudo leer la resolución del tráiler: {e}")
 
-    return trailer_path
+def plan_windows(duration, num_clips=15, clip_dur=CLIP_DURATION):
+    """Calcula los instantes de inicio de cada ventana, evitando iniciales y finales."""
+    skip_initial = SKIP_INITIAL_CLIPS * clip_dur
+    skip_final = SKIP_FINAL_CLIPS * clip_dur
+    effective_duration = duration - skip_initial - skip_final
+    if effective_duration <= 0:
+        logging.error("Duración efectiva del tráiler demasiado corta después de skips.")
+        return []
 
-def extract_clips(trailer_path, tmpdir, num_clips=15, clip_dur=CLIP_DURATION, interval=CLIP_INTERVAL):
-    """Extrae clips del tráiler usando FFmpeg con alta calidad, evitando iniciales y finales."""
-    clip_paths = []
+    # Ajustar intervalo para cubrir el centro con más clips
+    adjusted_interval = max(1, effective_duration / (num_clips - 1)) if num_clips > 1 else 0
+
+    starts = []
+    for i in range(num_clips):
+        start_time = skip_initial + i * adjusted_interval
+        if start_time + clip_dur > duration - skip_final:
+            break
+        starts.append(start_time)
+    return starts
+
+def plan_windows_from_shots(shots, duration, num_clips=15, clip_dur=CLIP_DURATION):
+    """
+    Coloca las ventanas dentro de planos detectados en vez de en una rejilla fija.
+
+    Prioriza los planos más largos: si el plano cabe entero, la ventana se centra
+    en él; si no, arranca justo después del corte. Las ventanas no se solapan y
+    respetan los mismos márgenes de inicio/final que la rejilla. Si no hay planos
+    suficientes se completa con la rejilla clásica, hasta tener al menos tantas
+    candidatas como ella.
+    """
+    lo = SKIP_INITIAL_CLIPS * clip_dur
+    hi = duration - SKIP_FINAL_CLIPS * clip_dur
+    if hi - lo < clip_dur:
+        return plan_windows(duration, num_clips, clip_dur)
+
+    candidates = []
+    for shot_start, shot_end in shots:
+        length = shot_end - shot_start
+        if length >= clip_dur:
+            start = shot_start + (length - clip_dur) / 2
+        else:
+            start = shot_start + SHOT_START_OFFSET
+        if lo <= start and start + clip_dur <= hi:
+            candidates.append((length, start))
+
+    starts = []
+    for _, start in sorted(candidates, reverse=True):
+        if len(starts) >= num_clips:
+            break
+        if all(abs(start - s) >= clip_dur for s in starts):
+            starts.append(start)
+
+    grid = plan_windows(duration, num_clips, clip_dur)
+    for start in grid:
+        if len(starts) >= num_clips:
+            break
+        if all(abs(start - s) >= clip_dur for s in starts):
+            starts.append(start)
+
+    # Con pocos cortes o un tráiler corto la rejilla solapa ventanas y da más candidatas:
+    # nunca menos que ella. Se añaden sus inicios más alejados de los ya elegidos.
+    rest = [g for g in grid if g not in starts]
+    while len(starts) < min(num_clips, len(grid)) and rest:
+        far = max(rest, key=lambda g: min((abs(g - s) for s in starts), default=0))
+        starts.append(far)
+        rest.remove(far)
+
+    return sorted(starts)
+
+def plan_clip_windows(trailer_path, duration, num_clips=15, clip_dur=CLIP_DURATION, analysis=None):
+    """Inicios de ventana según WINDOW_MODE (planos detectados o rejilla).
+
+    Si ya se hizo la pasada de análisis (clip_analysis.analyze_trailer), se reutiliza.
+    """
+    starts = []
+    if WINDOW_MODE == "scenes":
+        shots = analysis["shots"] if analysis else clip_analysis.detect_shots(trailer_path)[0]
+        if shots:
+            logging.info(f"🎬 {len(shots)} planos detectados en el tráiler.")
+            starts = plan_windows_from_shots(shots, duration, num_clips, clip_dur)
+    if not starts:
+        starts = plan_windows(duration, num_clips, clip_dur)
+    return starts
+
+def clip_filename(n):
+    """Nombre del clip temporal n (la extensión depende del formato intermedio)."""
+    return f"clip_{n}{INTERMEDIATE_FORMATS[INTERMEDIATE_FORMAT]['ext']}"
+
+def _extract_window(trailer_path, out_path, start_time, clip_dur, threads, copy=False, fps=None):
+    """Extrae una única ventana con FFmpeg. Devuelve la ruta si pasa el chequeo de tamaño.
+
+    `fps` es la expresión de output_policy (p.ej. "24000/1001"); con None se mantiene la del origen.
+    """
+    if copy:
+        # start_time ya cae en un keyframe: cortamos sin recodificar
+        cmd = [
+            'ffmpeg', '-y',
+            '-ss', str(start_time),
+            '-i', str(trailer_path),
+            '-t', str(clip_dur),
+            '-map', '0:v:0',
+            '-c', 'copy',
+            '-avoid_negative_ts', 'make_zero',
+            '-an',
+            str(out_path)
+        ]
+    else:
+        # Cadencia de la política de salida: los FPS nativos si son estándar (sin duplicar frames a 30)
+        cmd = [
+            'ffmpeg', '-y',
+            '-ss', str(start_time),
+            '-i', str(trailer_path),
+            '-t', str(clip_dur),
+            *INTERMEDIATE_FORMATS[INTERMEDIATE_FORMAT]["args"],
+            *(['-r', fps] if fps else []),
+            '-threads', str(threads),
+            '-an',
+            str(out_path)
+        ]
     try:
-        with VideoFileClip(str(trailer_path)) as trailer_clip:
-            duration = trailer_clip.duration
-            skip_initial = SKIP_INITIAL_CLIPS * clip_dur
-            skip_final = SKIP_FINAL_CLIPS * clip_dur
-            effective_duration = duration - skip_initial - skip_final
-            if effective_duration <= 0:
-                logging.error("Duración efectiva del tráiler demasiado corta después de skips.")
-                return []
-            
-            # Ajustar intervalo para cubrir el centro con más clips
-            adjusted_interval = max(1, effective_duration / (num_clips - 1)) if num_clips > 1 else 0
-            
-            # Detectar FPS originales para no forzar en la extracción
-            orig_fps = trailer_clip.fps or 24
-            
-            for i in range(num_clips):
-                start_time = skip_initial + i * adjusted_interval
-                if start_time + clip_dur > duration - skip_final:
-                    break
-                out_path = tmpdir / f"clip_{i+1}.mp4"
-                # Forzamos 30 FPS desde la extracción para máxima estabilidad en MoviePy
-                cmd = [
-                    'ffmpeg', '-y',
-                    '-ss', str(start_time),
-                    '-i', str(trailer_path),
-                    '-t', str(clip_dur),
-                    '-c:v', 'libx264',
-                    '-r', '30', # Estandarizamos a 30 FPS
-                    '-preset', 'ultrafast',
-                    '-crf', '20',
-                    '-an',
-                    '-pix_fmt', 'yuv420p',
-                    str(out_path)
-                ]
-                try:
-                    subprocess.check_call(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                    if out_path.exists() and out_path.stat().st_size > 50000: # Chequeo de tamaño mínimo
-                        clip_paths.append(out_path)
-                    else:
-                        logging.warning(f"Clip {i+1} no generado o es demasiado pequeño.")
-                except Exception as e:
-                    logging.error(f"Fallo al extraer clip {i+1} con FFmpeg: {e}")
+        subprocess.check_call(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if out_path.exists() and out_path.stat().st_size > 50000: # Chequeo de tamaño mínimo
+            return out_path
+        logging.warning(f"Clip {out_path.stem} no generado o es demasiado pequeño.")
     except Exception as e:
-        logging.error(f"Error al obtener duración del tráiler: {e}")
-    return clip_paths
+        logging.error(f"Fallo al extraer {out_path.stem} con FFmpeg: {e}")
+    return None
+
+def get_duration(video_path):
+    """Duración del vídeo en segundos (0 si no se puede leer)."""
+    info = media_probe.probe(video_path)
+    if not info or not info.get("duration"):
+        logging.error(f"Error al obtener duración de {Path(video_path).name}")
+        return 0
+    return info["duration"]
+
+def download_sections(url, windows, dest_dir, clip_dur=CLIP_DURATION, fmt=SECTION_FORMAT):
+    """
+    Descarga a calidad completa solo los tramos [inicio, inicio + clip_dur] pedidos.
+
+    Usa download_ranges de yt-dlp (vale para YouTube, DASH .mpd y HLS .m3u8), forzando
+    keyframes en los cortes. Devuelve {inicio: ruta} con los tramos que llegaron.
+    """
+    ydl_opts = _ydl_opts(Path(dest_dir) / "section_%(section_start)s.%(ext)s", fmt)
+    ydl_opts['download_ranges'] = yt_dlp.utils.download_range_func(None, [(s, s + clip_dur) for s in windows])
+    ydl_opts['force_keyframes_at_cuts'] = True
+
+    ydl_opts.update(_auth_opts(url))
+
+    sections = {}
+    try:
+        logging.info(f"✂️ Descargando {len(windows)} tramos de {clip_dur}s a calidad completa...")
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=True)
+        for d in (info or {}).get('requested_downloads', []):
+            path = Path(d.get('filepath') or d.get('filename') or "")
+            start = d.get('section_start')
+            if start is not None and path.exists():
+                # Emparejamos con la ventana pedida más cercana (yt-dlp puede redondear)
+                closest = min(windows, key=lambda w: abs(w - start))
+                sections[closest] = path
+    except Exception as e:
+        logging.error(f"❌ Falló la descarga por tramos: {e}")
+    return sections
+
+def extract_clips(trailer_path, tmpdir, num_clips=15, clip_dur=CLIP_DURATION, interval=CLIP_INTERVAL,
+                  workers=EXTRACT_WORKERS, mode=EXTRACT_MODE, starts=None, analysis=None):
+    """Extrae clips del tráiler usando FFmpeg con alta calidad, evitando iniciales y finales.
+
+    Las ventanas se codifican en paralelo (`workers` procesos ffmpeg a la vez);
+    el orden y el nombre de los clips (clip_1, clip_2...) se mantienen.
+    En modo "copy" cada ventana se desplaza al keyframe más cercano y se corta con
+    `-c copy`; solo se recodifica si no hay keyframe dentro de la tolerancia.
+    Si se pasan `starts`, se usan esas ventanas en vez de planificarlas.
+    """
+    duration = get_duration(trailer_path)
+    if not duration:
+        return []
+
+    if starts is None:
+        starts = plan_clip_windows(trailer_path, duration, num_clips, clip_dur, analysis)
+    if not starts:
+        return []
+
+    # Plan por ventana: (inicio, copiar sin recodificar)
+    jobs = [(start_time, False) for start_time in starts]
+    if mode == "copy":
+        keyframes = get_keyframes(trailer_path)
+        used = set()
+        jobs = []
+        for start_time in starts:
+            k = snap_to_keyframe(start_time, keyframes)
+            if k is not None and k not in used and k + clip_dur <= duration:
+                used.add(k)
+                jobs.append((k, True))
+            else:
+                jobs.append((start_time, False))
+        n_copy = sum(1 for _, c in jobs if c)
+        logging.info(f"🔑 {len(keyframes)} keyframes detectados: {n_copy}/{len(jobs)} ventanas por copia directa.")
+
+    workers = max(1, min(workers, len(starts)))
+    # Repartimos los hilos de x264 entre los procesos para no sobresuscribir la CPU
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    _, fps = output_policy.choose_fps(get_video_info(trailer_path)[0])
+    logging.info(f"⚙️ Extrayendo {len(starts)} ventanas con {workers} procesos ffmpeg ({threads} hilos c/u, {fps} fps)...")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_extract_window, trailer_path, tmpdir / clip_filename(i+1), start_time, clip_dur, threads, copy, fps)
+            for i, (start_time, copy) in enumerate(jobs)
+        ]
+        results = [f.result() for f in futures]
+
+    return [p for p in results if p is not None]
 
-def select_best_clips(clip_paths):
-    """Selecciona los mejores clips basados en diversidad visual y evita inicios en negro."""
+def score_clips(clip_paths, workers=EXTRACT_WORKERS):
+    """Puntúa todos los clips en paralelo. Devuelve {nombre_clip: métricas}."""
+    if not clip_paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(clip_paths)))) as pool:
+        rows = list(pool.map(clip_analysis.score_clip, clip_paths))
+    return {p.name: row for p, row in zip(clip_paths, rows) if row is not None}
+
+def select_best_clips(clip_paths, scores=None):
+    """Selecciona los mejores clips basados en diversidad visual y evita negros, rótulos y planos fijos.
+
+    Cada clip se decodifica una sola vez a miniatura (ver clip_analysis.score_frames).
+    Los hashes se empaquetan en uint64 y la diversidad se resuelve de golpe sobre la
+    matriz de Hamming (max-min), no por orden de llegada.
+    """
     if not clip_paths:
         return []
-    
-    hashes = []
-    selected_clips = []
+    if scores is None:
+        scores = score_clips(clip_paths)
     
     # Contadores para el log informativo
     discarded_black = 0
-    discarded_diversity = 0
-    candidates_pool = [] # Clips que pasan el filtro de negros pero no el de diversidad
+    discarded_text = 0
+    discarded_static = 0
+    good_paths = [] # Clips que pasan todos los filtros
+    rejected = []   # Clips rechazados, por si hay que rescatar
+    hashes = []
     
     for path in clip_paths:
-        try:
-            with VideoFileClip(str(path)) as clip:
-                # 1. COMPROBACIÓN EXHAUSTIVA DE NEGROS/LOGOS
-                check_points = [0.1, 0.5, 1.2]
-                is_bad = False
-                avg_b = 0
-                
-                for p in check_points:
-                    frame = clip.get_frame(p)
-                    avg_b = np.mean(frame)
-                    if avg_b < 25 or np.std(frame) < 5:
-                        is_bad = True
-                        break
-                
-                if is_bad:
-                    discarded_black += 1
-                    logging.info(f"   [x] Clip {path.name} descartado (negro/logo, brillo: {avg_b:.1f}).")
-                    continue
-
-                # 2. COMPROBACIÓN DE DIVERSIDAD (EXISTENTE)
-                frame_for_hash = clip.get_frame(2.0)
-                img = Image.fromarray(frame_for_hash)
-                h = imagehash.average_hash(img)
-                
-                is_diverse = True
-                for existing_hash in hashes:
-                    if h - existing_hash < HASH_SIMILARITY_THRESHOLD:
-                        is_diverse = False
-                        break
-                
-                if is_diverse:
-                    hashes.append(h)
-                    selected_clips.append(path)
-                else:
-                    discarded_diversity += 1
-                    candidates_pool.append(path)
-                    logging.info(f"   [-] Clip {path.name} con poca diversidad.")
-        except Exception as e:
-            logging.warning(f"No se pudo procesar el clip para selección: {path.name}, error: {e}")
-
-    logging.info(f"📊 RESUMEN FILTRADO: {len(selected_clips)} ideales, {discarded_black} negros/logos, {discarded_diversity} similares.")
-
-    # --- JERARQUÍA DE RESCATE ---
-    # 1. Si faltan, rellenar con los similares (pero que tienen luz)
-    if len(selected_clips) < MAX_CLIPS and candidates_pool:
-        needed = MAX_CLIPS - len(selected_clips)
-        logging.info(f"⚠️ Faltan clips. Rescatando {min(needed, len(candidates_pool))} similares con luz...")
-        for p in candidates_pool:
-            if len(selected_clips) < MAX_CLIPS:
-                selected_clips.append(p)
-
-    # 2. Si aún faltan (tráiler muy oscuro), rescatar incluso los negros
-    if len(selected_clips) < MAX_CLIPS:
+        row = scores.get(path.name)
+        if row is None:
+            logging.warning(f"No se pudo procesar el clip para selección: {path.name}")
+            continue
+
+        if row["is_black"]:
+            discarded_black += 1
+            logging.info(f"   [x] Clip {path.name} descartado (negro/logo, brillo: {row['luma_mean']:.1f}).")
+        elif row["is_text_card"]:
+            discarded_text += 1
+            logging.info(f"   [x] Clip {path.name} descartado (rótulo de texto, bordes: {row['edge_density']:.3f}).")
+        elif row["is_static"]:
+            discarded_static += 1
+            logging.info(f"   [x] Clip {path.name} descartado (plano fijo, movimiento: {row['motion']:.4f}).")
+        else:
+            hashes.append(np.uint64(int(row["hash"], 16)))
+            good_paths.append(path)
+            continue
+        rejected.append(path)
+
+    # SELECCIÓN MAX-MIN SOBRE TODOS LOS CANDIDATOS VÁLIDOS
+    chosen = clip_analysis.select_diverse(hashes, MAX_CLIPS)
+    selected_clips = [good_paths[i] for i in chosen]
+    min_dist = clip_analysis.min_pairwise_distance([hashes[i] for i in chosen])
+    discarded_diversity = len(good_paths) - len(selected_clips)
+
+    logging.info(f"📊 RESUMEN FILTRADO: {len(selected_clips)} elegidos, {discarded_black} negros/logos, "
+                 f"{discarded_text} rótulos, {discarded_static} fijos, {discarded_diversity} descartados por diversidad.")
+    if len(selected_clips) > 1:
+        logging.info(f"   Distancia mínima entre clips elegidos: {min_dist} bits.")
+        if min_dist < HASH_SIMILARITY_THRESHOLD:
+            logging.info(f"⚠️ No hay {len(selected_clips)} clips realmente distintos; se usan los más diversos disponibles.")
+
+    # --- RESCATE ---
+    # Si aún faltan (tráiler muy oscuro), rescatar los rechazados con mejor nota bruta
+    if len(selected_clips) < MAX_CLIPS and rejected:
         needed = MAX_CLIPS - len(selected_clips)
-        logging.info(f"🚨 ¡CRÍTICO! Faltan clips. Rescatando {needed} incluso si son negros/logos...")
-        for p in clip_paths:
-            if p not in selected_clips and len(selected_clips) < MAX_CLIPS:
-                selected_clips.append(p)
+        logging.info(f"🚨 ¡CRÍTICO! Faltan clips. Rescatando {min(needed, len(rejected))} de los rechazados...")
+        rejected.sort(key=lambda p: (scores[p.name]["luma_std"] + 100 * scores[p.name]["motion"]), reverse=True)
+        selected_clips += rejected[:needed]
+        selected_clips.sort(key=clip_paths.index)
 
     return selected_clips[:MAX_CLIPS]
 
@@ -320,12 +534,203 @@ def save_clips(best_paths, tmdb_id, slug):
     """Guarda los clips seleccionados en la carpeta final."""
     saved_paths = []
     for i, path in enumerate(best_paths):
-        dest_path = CLIPS_DIR / f"{tmdb_id}_{slug}_clip_{i+1}.mp4"
+        dest_path = CLIPS_DIR / f"{tmdb_id}_{slug}_clip_{i+1}{path.suffix}"
         shutil.move(str(path), str(dest_path))
         saved_paths.append(str(dest_path.relative_to(ROOT)))
     return saved_paths
 
 
+def extract_by_sections(trailer_url, tmdb_id, slug, tmpdir, sel):
+    """
+    Modo "sections": analiza una versión ligera del tráiler y baja a calidad completa
+    solo las ventanas elegidas.
+
+    Devuelve un dict con trailer (la versión ligera), clips (de análisis), scores,
+    best (clips finales), analysis y duplicate. Si algo falla, best es None y main()
+    cae al modo de descarga completa.
+    """
+    result = {"trailer": None, "clips": [], "scores": None, "best": None, "analysis": None, "duplicate": None}
+    lowres = download_trailer(trailer_url, tmdb_id, slug, fmt=ANALYSIS_FORMAT, suffix="analysis", max_height=360)
+    if not lowres or not lowres.exists():
+        logging.warning("⚠️ No se pudo bajar la versión de análisis. Usando descarga completa.")
+        return result
+    result["trailer"] = lowres
+
+    analysis = clip_analysis.analyze_trailer(lowres)
+    result["analysis"] = analysis
+    result["duplicate"] = check_duplicate(analysis, sel)
+    if result["duplicate"]:
+        return result
+
+    duration = get_duration(lowres)
+    starts = plan_clip_windows(lowres, duration, analysis=analysis)
+    analysis_dir = tmpdir / "analysis"
+    analysis_dir.mkdir(parents=True, exist_ok=True)
+    clip_paths = extract_clips(lowres, analysis_dir, mode="reencode", starts=starts)
+    logging.info(f"Clips de análisis extraídos: {len(clip_paths)}")
+    result["clips"] = clip_paths
+
+    clip_scores = score_clips(clip_paths)
+    result["scores"] = clip_scores
+    best_analysis = select_best_clips(clip_paths, clip_scores)
+    # clip_N.mp4 corresponde a starts[N-1]
+    chosen_starts = [starts[int(p.stem.split('_')[-1]) - 1] for p in best_analysis]
+    for p in clip_paths:
+        if p.name in clip_scores:
+            clip_scores[p.name]["start"] = round(starts[int(p.stem.split('_')[-1]) - 1], 2)
+            clip_scores[p.name]["selected"] = p in best_analysis
+
+    sections_dir = tmpdir / "sections"
+    sections_dir.mkdir(parents=True, exist_ok=True)
+    sections = download_sections(trailer_url, chosen_starts, sections_dir)
+    if len(sections) < len(chosen_starts):
+        logging.warning(f"⚠️ Solo llegaron {len(sections)}/{len(chosen_starts)} tramos. Usando descarga completa.")
+        return result
+
+    # Normalizamos cada tramo igual que un clip extraído (mismo códec, nombre y chequeo de tamaño)
+    threads = max(1, (os.cpu_count() or 1) // max(1, len(chosen_starts)))
+    _, fps = output_policy.choose_fps(get_video_info(sections[chosen_starts[0]])[0])
+    best_paths = []
+    with ThreadPoolExecutor(max_workers=max(1, min(EXTRACT_WORKERS, len(chosen_starts)))) as pool:
+        futures = [
+            pool.submit(_extract_window, sections[start], tmpdir / clip_filename(i+1), 0, CLIP_DURATION, threads, EXTRACT_MODE == "copy", fps)
+            for i, start in enumerate(chosen_starts)
+        ]
+        best_paths = [f.result() for f in futures]
+    if any(p is None for p in best_paths):
+        logging.warning("⚠️ Algún tramo no pasó la validación. Usando descarga completa.")
+        return result
+
+    logging.info(f"✅ {len(best_paths)} clips obtenidos por tramos (sin bajar el tráiler completo).")
+    result["best"] = best_paths
+    return result
+
+def check_duplicate(analysis, sel):
+    """
+    Compara la huella del tráiler con el índice de tráileres ya procesados.
+
+    Devuelve None (seguir normal), ("reuse", clips) si ya tenemos sus clips en disco,
+    o ("skip", entrada) si es una re-subida de un tráiler ya publicado. La entrada del propio
+    vídeo no cuenta: al repetir la extracción de un tráiler indexado no debe casar consigo mismo.
+    """
+    video_id = trailer_probe.video_id_from_url(sel.get("trailer_url"))
+    match = trailer_fingerprint.find_match(analysis["fingerprint"], exclude_video_id=video_id)
+    if not match:
+        return None
+
+    clips = match.get("clips") or []
+    if match.get("tmdb_id") == sel.get("tmdb_id") and clips and all((ROOT / c).exists() for c in clips):
+        logging.info(f"♻️ Tráiler ya procesado: reutilizando {len(clips)} clips en caché.")
+        return ("reuse", clips)
+
+    if match.get("video_id") != video_id and movie_utils.is_published(match.get("tmdb_id")):
+        reason = f"Tráiler re-subido: coincide con '{match.get('title')}' ya publicado ({match.get('video_id')})"
+        logging.warning(f"🧬 {reason}.")
+        trailer_fingerprint.mark_duplicate(video_id, match.get("video_id"))
+        movie_utils.log_discard(sel.get("titulo", "N/A"), reason, sel.get("tmdb_id"))
+        return ("skip", match)
+    return None
+
+def extract_progressive(trailer_url, tmdb_id, slug, tmpdir, clip_dur=CLIP_DURATION):
+    """
+    Modo "progressive": descarga un único stream (sin merge) y va extrayendo ventanas en
+    cuanto los bytes que las contienen están en disco, solapando red y CPU.
+
+    La duración disponible se estima con la proporción de bytes descargados (con un
+    margen de seguridad). Se usa la rejilla de ventanas porque la detección de planos
+    necesita el fichero entero. Devuelve (tráiler, clips) o (None, []) si falla.
+    """
+    outtmpl = TRAILERS_DIR / f"{tmdb_id}_{slug}_trailer.%(ext)s"
+    ydl_opts = _ydl_opts(outtmpl, PROGRESSIVE_FORMAT)
+    # Escribimos directamente al nombre final (sin .part ni fixups) para que ffmpeg
+    # pueda leer el mismo fichero durante toda la descarga, también en Windows.
+    ydl_opts['nopart'] = True
+    ydl_opts['fixup'] = 'never'
+    ydl_opts.update(_auth_opts(trailer_url))
+
+    probe = trailer_probe.probe(trailer_url)
+    duration = float(probe.get('duration') or 0)
+    if not probe.get('ok') or not duration:
+        logging.warning(f"⚠️ No se pudo obtener info previa del tráiler: {probe.get('reason')}")
+        return None, []
+
+    starts = plan_windows(duration, 15, clip_dur)
+    if not starts:
+        return None, []
+
+    state = {'downloaded': 0, 'total': 0, 'filename': None, 'done': False, 'error': None}
+
+    def hook(d):
+        state['filename'] = d.get('filename') or state['filename']
+        state['downloaded'] = d.get('downloaded_bytes') or state['downloaded']
+        state['total'] = d.get('total_bytes') or d.get('total_bytes_estimate') or state['total']
+
+    def download():
+        try:
+            opts = dict(ydl_opts, progress_hooks=[hook])
+            with yt_dlp.YoutubeDL(opts) as ydl:
+                ydl.download([trailer_url])
+        except Exception as e:
+            state['error'] = e
+        finally:
+            state['done'] = True
+
+    logging.info(f"📶 Descarga progresiva: {len(starts)} ventanas se extraerán según lleguen los datos...")
+    downloader = threading.Thread(target=download, daemon=True)
+    downloader.start()
+
+    workers = max(1, min(EXTRACT_WORKERS, len(starts)))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    # Sin fps explícito: el fichero aún no se puede sondear entero, así que se mantiene
+    # la cadencia nativa y build_short aplica la política de salida al renderizar.
+    pending = list(enumerate(starts))
+    futures = {}
+    early = set()  # Ventanas lanzadas antes de acabar la descarga (pueden salir cortas)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending:
+            done = state['done']
+            if done and state['error']:
+                logging.error(f"❌ Falló la descarga progresiva: {state['error']}")
+                break
+            src = state['filename']
+            if done and not (src and Path(src).exists()):
+                logging.error("❌ La descarga progresiva terminó sin fichero de salida.")
+                break
+            # Al terminar se lanzan todas aunque yt-dlp nunca informara del tamaño total
+            if src and (done or state['total']):
+                ratio = 1.0 if done else state['downloaded'] / state['total'] * (1 - PROGRESSIVE_MARGIN)
+                available = duration * ratio
+                ready = [(i, st) for i, st in pending if done or st + clip_dur <= available]
+                for i, st in ready:
+                    futures[i] = pool.submit(_extract_window, Path(src), tmpdir / clip_filename(i+1), st, clip_dur, threads)
+                    pending.remove((i, st))
+                    if not done:
+                        early.add(i)
+                if ready:
+                    logging.info(f"   ⏱️ {available:.0f}/{duration:.0f}s disponibles: {len(ready)} ventanas lanzadas.")
+            if pending:
+                time.sleep(PROGRESSIVE_POLL)
+        downloader.join()
+        results = {i: f.result() for i, f in futures.items()}
+
+    trailer_path = Path(state['filename']) if state['filename'] else None
+    if state['error'] or not trailer_path or not trailer_path.exists():
+        # No dejamos un tráiler a medias que luego confunda a download_trailer()
+        if trailer_path and trailer_path.exists():
+            trailer_path.unlink(missing_ok=True)
+        return None, []
+
+    # Ventanas que fallaron o que se leyeron con la descarga a medias y salieron cortas
+    # (pasan el chequeo de tamaño igualmente): segundo intento con el fichero completo
+    for i, path in results.items():
+        expected = min(clip_dur, duration - starts[i]) - PROGRESSIVE_DURATION_TOLERANCE
+        if path is None or (i in early and get_duration(path) < expected):
+            if path is not None:
+                logging.warning(f"   ✂️ {path.stem} salió corto al leerse durante la descarga; se vuelve a extraer.")
+            results[i] = _extract_window(trailer_path, tmpdir / clip_filename(i+1), starts[i], clip_dur, threads)
+
+    return trailer_path, [results[i] for i in sorted(results) if results[i] is not None]
+
 def main():
     if not SEL_FILE.exists():
         logging.warning("Falta next_release.json. Omitiendo.")
@@ -348,16 +753,51 @@ def main():
     tmpdir.mkdir(parents=True, exist_ok=True)
 
     try:
-        logging.info(f"Descargando tráiler desde {trailer_url}...")
-        # CAMBIO: La descarga ahora devuelve la ruta final y persistente del tráiler
-        trailer_path = download_trailer(trailer_url, tmdb_id, slug)
-        
-        if not trailer_path or not trailer_path.exists():
-            logging.error(f"Archivo de tráiler no encontrado después de la descarga.")
-            return
+        clip_scores = None
+        best_paths = None
+        trailer_path = None
+        analysis = None
+        duplicate = None
+        clip_paths_temp = []
+
+        if DOWNLOAD_MODE == "sections":
+            res = extract_by_sections(trailer_url, tmdb_id, slug, tmpdir, sel)
+            trailer_path, clip_paths_temp, clip_scores, best_paths = res["trailer"], res["clips"], res["scores"], res["best"]
+            analysis, duplicate = res["analysis"], res["duplicate"]
+        elif DOWNLOAD_MODE == "progressive":
+            trailer_path, clip_paths_temp = extract_progressive(trailer_url, tmdb_id, slug, tmpdir)
+            if clip_paths_temp:
+                logging.info(f"Clips extraídos durante la descarga: {len(clip_paths_temp)}")
+                # La huella necesita el fichero completo; la pasada a miniatura es barata
+                analysis = clip_analysis.analyze_trailer(trailer_path)
+                duplicate = check_duplicate(analysis, sel)
+                clip_scores = score_clips(clip_paths_temp)
+                best_paths = select_best_clips(clip_paths_temp, clip_scores)
+            else:
+                logging.warning("⚠️ La extracción progresiva no produjo clips. Usando descarga completa.")
+
+        if best_paths is None and duplicate is None:
+            logging.info(f"Descargando tráiler desde {trailer_url}...")
+            # CAMBIO: La descarga ahora devuelve la ruta final y persistente del tráiler
+            trailer_path = download_trailer(trailer_url, tmdb_id, slug)
+            
+            if not trailer_path or not trailer_path.exists():
+                logging.error(f"Archivo de tráiler no encontrado después de la descarga.")
+                return
+
+            # Pasada de análisis única: planos para colocar ventanas + huella anti-duplicados
+            analysis = clip_analysis.analyze_trailer(trailer_path)
+            duplicate = check_duplicate(analysis, sel)
 
-        # Detectar FPS y resolución original de forma robusta
-        orig_fps, orig_w, orig_h = get_video_info(trailer_path)
+        if duplicate and duplicate[0] == "skip":
+            sys.exit(1)
+
+        # Detectar FPS y resolución original de forma robusta (en modo tramos/reutilizado, del primer clip a calidad completa)
+        if duplicate and duplicate[0] == "reuse":
+            info_src = ROOT / duplicate[1][0]
+        else:
+            info_src = best_paths[0] if best_paths else trailer_path
+        orig_fps, orig_w, orig_h = get_video_info(info_src)
         logging.info(f"🎞️ Info tráiler: {orig_w}x{orig_h} @ {orig_fps:.2f} FPS")
 
         # Guardar info en next_release para el histórico
@@ -366,13 +806,24 @@ def main():
         sel['trailer_h'] = orig_h
         SEL_FILE.write_text(json.dumps(sel, ensure_ascii=False, indent=2), encoding="utf-8")
 
-        clip_paths_temp = extract_clips(trailer_path, tmpdir)
-        logging.info(f"Clips extraídos temporalmente: {len(clip_paths_temp)}")
+        if duplicate and duplicate[0] == "reuse":
+            saved_paths = duplicate[1]
+            best_paths = []
+            clip_scores = clip_scores or {}
+        else:
+            if best_paths is None:
+                clip_paths_temp = extract_clips(trailer_path, tmpdir, analysis=analysis)
+                logging.info(f"Clips extraídos temporalmente: {len(clip_paths_temp)}")
+
+                clip_scores = score_clips(clip_paths_temp)
+                best_paths = select_best_clips(clip_paths_temp, clip_scores)
 
-        best_paths = select_best_clips(clip_paths_temp)
+            saved_paths = save_clips(best_paths, tmdb_id, slug)
+            logging.info(f"Clips finales guardados: {saved_paths}")
 
-        saved_paths = save_clips(best_paths, tmdb_id, slug)
-        logging.info(f"Clips finales guardados: {saved_paths}")
+        if analysis:
+            trailer_fingerprint.add(trailer_probe.video_id_from_url(trailer_url), tmdb_id,
+                                    sel.get("titulo"), analysis["fingerprint"], saved_paths)
 
         manifest_path = STATE / "assets_manifest.json"
         if manifest_path.exists():
@@ -383,10 +834,18 @@ def main():
             manifest["trailer_fps"] = orig_fps
             manifest["trailer_w"] = orig_w
             manifest["trailer_h"] = orig_h
+            # Tabla de puntuaciones por ventana (para depurar selecciones sosas)
+            selected_names = {p.name for p in best_paths}
+            manifest["clip_scores"] = [
+                {"clip": p.name, "selected": p.name in selected_names, **clip_scores[p.name]}
+                for p in clip_paths_temp if p.name in clip_scores
+            ]
             manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
             logging.info(f"Manifiesto actualizado: {orig_w}x{orig_h} @ {orig_fps} FPS")
         else:
             logging.warning("Manifiesto no encontrado. No se actualizaron los clips.")
+    except SystemExit:
+        raise
     except Exception as e:
         logging.error(f"Error inesperado en el proceso de extracción: {e}")
 
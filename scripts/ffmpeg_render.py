@@ -0,0 +1,649 @@
+# scripts/ffmpeg_render.py
+"""
+Backend de render con un único filtergraph de ffmpeg (alternativa a moviepy).
+
+Expresa la misma línea de tiempo que build_short en moviepy:
+  póster (cubre todo el 9:16) -> clips con recorte cuadrado central sobre fondo negro
+  -> concat; narración con 1 s de silencio previo + música en bucle con fundidos y
+  volumen 0.07 -> mezcla -> libx264.
+
+Todo el trabajo por píxel ocurre en código nativo multihilo en vez de componer cada
+frame en Python.
+
+Con SEGMENT_CACHE cada tramo (intro y cada clip ya en 9:16) se codifica por separado en
+assets/segment_cache/ con una clave hash de sus entradas y parámetros; el vídeo final
+se une con el demuxer concat sin recodificar y el audio se mezcla una sola vez. Así, un
+cambio de narración o música, o un reintento, solo recodifica lo que ha cambiado.
+
+Los tramos se parten además en trozos de CHUNK_SECONDS con límites exactos de frame
+(-frames:v) y se codifican en paralelo (RENDER_WORKERS procesos ffmpeg). Cada trozo
+empieza en IDR, así que la unión sin recodificar es exacta.
+
+Las capas superpuestas ("overlays", ver compositor.py) se mezclan por trozo: ffmpeg
+decodifica y normaliza a rawvideo, el compositor NumPy mezcla en un buffer preasignado
+y otro ffmpeg codifica. Los trozos sin capas activas siguen por la vía nativa.
+
+Con varios formatos de salida (9:16, 1:1, 16:9; ver output_policy.PROFILES) se usa
+render_profiles: un único ffmpeg que decodifica cada clip una vez, lo reparte con split
+a una cadena de normalización por formato y alimenta un codificador por salida (el
+audio se mezcla una vez y se reparte con asplit). Las capas se aplican ahí con el
+filtro overlay de ffmpeg.
+
+La línea de tiempo es un dict (ver build_short.build_timeline):
+
+    {"width", "height", "fps", "fps_expr", "bitrate", "square_size",
+     "fit": "square" | "cover"  (opcional, cómo entran los clips; por defecto "square"),
+     "background": "black" | "blur"  (opcional, relleno alrededor del cuadrado),
+     "crf", "maxrate", "bufsize"  (opcionales: CRF con techo VBV, ver output_policy.rate_control),
+     "intro": {"path", "duration"}, "clips": [{"path", "duration", "crop_path"}, ...],
+     "voice": ruta, "voice_delay": s, "music": ruta | None, "music_volume", "music_fade",
+     "overlays": [{"path", "x", "y", "width", "start", "end"}, ...]  (opcional)}
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+import compositor
+import output_policy
+
+ROOT = Path(__file__).resolve().parents[1]
+SEGMENT_CACHE_DIR = ROOT / "assets" / "segment_cache"
+
+SEGMENT_CACHE = True
+SEGMENT_CACHE_MAX_AGE_DAYS = 3
+PART_GRACE_HOURS = 1  # Un .part más reciente puede ser de un render en curso en otro proceso
+SEGMENT_VERSION = 5  # Subir si cambian los filtros de los tramos: invalida el caché
+
+# Codificación paralela: procesos ffmpeg simultáneos y longitud de cada trozo (0 = sin trocear)
+RENDER_WORKERS = min(8, os.cpu_count() or 1)
+CHUNK_SECONDS = 3.0
+
+AUDIO_RATE = 44100
+AUDIO_CODEC_ARGS = ['-c:a', 'aac', '-b:a', '192k']
+# Fondo "blur": el propio clip cubriendo el frame, desenfocado a 1/BLUR_DOWNSCALE de
+# resolución y reescalado (un desenfoque a tamaño completo costaría ~BLUR_DOWNSCALE² más)
+BLUR_DOWNSCALE = 8
+BLUR_RADIUS = 4         # Radio del boxblur en la miniatura (~32 px a tamaño completo)
+BLUR_BRIGHTNESS = -0.12  # Fondo algo más oscuro para que destaque el cuadrado
+
+VIDEO_PRESET = "medium"
+VIDEO_CRF = "18"
+# SSIM/PSNR que calcula el propio x264 al codificar (se registran junto al tamaño final).
+# x264 avisa de que con psy activado el PSNR no es exacto: sirve para comparar renders, no como referencia.
+ENCODER_METRICS = True
+
+
+def timeline_duration(timeline: dict) -> float:
+    return timeline["intro"]["duration"] + sum(c["duration"] for c in timeline["clips"])
+
+
+def peak_gain_db(path) -> float:
+    """Ganancia (dB) que lleva el pico a 0 dBFS, como afx.AudioNormalize. Solo decodifica audio."""
+    proc = subprocess.run(
+        ['ffmpeg', '-hide_banner', '-i', str(path), '-vn', '-af', 'volumedetect', '-f', 'null', '-'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors="replace"
+    )
+    m = re.search(r"max_volume:\s*(-?[\d.]+) dB", proc.stderr)
+    return -float(m.group(1)) if m else 0.0
+
+
+def intro_filter(src: str, timeline: dict, label: str) -> str:
+    """Póster escalado para cubrir el vertical y recortado al centro (como clip_from_img)."""
+    w, h = timeline["width"], timeline["height"]
+    return (f"[{src}]scale={w}:{h}:force_original_aspect_ratio=increase,crop={w}:{h},"
+            f"setsar=1,fps={timeline['fps_expr']},format=yuv420p,"
+            f"trim=duration={timeline['intro']['duration']}[{label}]")
+
+
+def crop_x_expr(points: list, side: str, t_offset: float = 0.0) -> str:
+    """
+    x del crop (expresión de ffmpeg evaluada por frame) que sigue la trayectoria del centro
+    [[t, centro_x], ...] de clip_analysis.crop_path, interpolando linealmente y sin salirse.
+    `t_offset` es el instante del clip en el que empieza este trozo.
+    """
+    t = f"(t+{t_offset:.6f})" if t_offset else "t"
+    expr = str(points[-1][1])
+    for (t0, c0), (t1, c1) in reversed(list(zip(points[:-1], points[1:]))):
+        span = max(t1 - t0, 1e-3)
+        expr = f"if(lt({t},{t1}),{c0}+({c1 - c0:.4f})*({t}-{t0})/{span:.4f},{expr})"
+    return f"clip(({expr})*iw-({side})/2,0,iw-({side}))"
+
+
+def clip_filter(src: str, clip: dict, timeline: dict, label: str, t_offset: float = 0.0) -> str:
+    """
+    Cuadrado (lado par) escalado a square_size y centrado sobre negro (como resize_to_9_16).
+    El cuadrado es el central, o sigue la trayectoria de "crop_path" si el clip la trae.
+    """
+    w, h, s = timeline["width"], timeline["height"], timeline["square_size"]
+    if timeline.get("fit") == "cover":
+        # El clip llena el frame (16:9 desde un tráiler 16:9: solo escala)
+        return (f"[{src}]setpts=PTS-STARTPTS,scale={w}:{h}:force_original_aspect_ratio=increase,"
+                f"crop={w}:{h},setsar=1,fps={timeline['fps_expr']},format=yuv420p,"
+                f"trim=duration={clip['duration']},setpts=PTS-STARTPTS[{label}]")
+    side = "trunc(min(iw,ih)/2)*2"
+    crop = f"crop='{side}':'{side}'"
+    if clip.get("crop_path"):
+        crop += f":'{crop_x_expr(clip['crop_path'], side, t_offset)}'"
+    tail = (f"setsar=1,fps={timeline['fps_expr']},format=yuv420p,"
+            f"trim=duration={clip['duration']},setpts=PTS-STARTPTS[{label}]")
+    if timeline.get("background") != "blur" or (s >= w and s >= h):
+        return f"[{src}]setpts=PTS-STARTPTS,{crop},scale={s}:{s},pad={w}:{h}:(ow-iw)/2:(oh-ih)/2:black,{tail}"
+    # Cadencia y recorte ANTES del split: tras el overlay, fps/trim perdían el último frame
+    return (f"[{src}]setpts=PTS-STARTPTS,fps={timeline['fps_expr']},"
+            f"trim=duration={clip['duration']},setpts=PTS-STARTPTS,split[{label}_fg][{label}_bg];"
+            f"[{label}_bg]{blur_fill_filter(w, h)}[{label}_fill];"
+            f"[{label}_fg]{crop},scale={s}:{s}[{label}_sq];"
+            f"[{label}_fill][{label}_sq]overlay=(W-w)/2:(H-h)/2,setsar=1,format=yuv420p[{label}]")
+
+
+def blur_fill_filter(w: int, h: int) -> str:
+    """Cadena de fondo desenfocado: cubrir a baja resolución, boxblur, oscurecer y escalar a w x h."""
+    lw = max(2, w // BLUR_DOWNSCALE // 2 * 2)
+    lh = max(2, h // BLUR_DOWNSCALE // 2 * 2)
+    return (f"scale={lw}:{lh}:force_original_aspect_ratio=increase,crop={lw}:{lh},"
+            f"boxblur={BLUR_RADIUS}:2,eq=brightness={BLUR_BRIGHTNESS},"
+            f"scale={w}:{h}:flags=bilinear")
+
+
+def audio_filter(voice_src: str, music_src: str | None, timeline: dict, total: float, label: str) -> str:
+    """Narración retrasada + música recortada con fundidos, mezcladas sin renormalizar."""
+    fmt = f"aformat=sample_rates={AUDIO_RATE}:channel_layouts=stereo"
+    delay_ms = int(timeline.get("voice_delay", 1.0) * 1000)
+    voice_chain = f"[{voice_src}]{fmt},"
+    if music_src is None:
+        return f"{voice_chain}adelay={delay_ms}:all=1,apad=whole_dur={total},atrim=0:{total}[{label}]"
+
+    # Igual que moviepy: con música, voz y música se normalizan a pico antes de mezclar
+    fade = timeline.get("music_fade", 1.0)
+    voice_chain += f"volume={timeline.get('voice_gain_db', 0.0)}dB,"
+    return (
+        f"{voice_chain}adelay={delay_ms}:all=1,apad=whole_dur={total},atrim=0:{total}[voice];"
+        f"[{music_src}]{fmt},atrim=0:{total},asetpts=PTS-STARTPTS,"
+        f"volume={timeline.get('music_gain_db', 0.0)}dB,"
+        f"afade=t=in:d={fade},afade=t=out:st={max(0.0, total - fade)}:d={fade},"
+        f"volume={timeline.get('music_volume', 0.07)}[music];"
+        f"[voice][music]amix=inputs=2:duration=first:normalize=0[{label}]"
+    )
+
+
+def video_encode_args(timeline: dict) -> list:
+    """
+    Ajustes de x264 de la línea de tiempo. Con "maxrate": CRF con techo VBV (tamaño acotado);
+    sin él, los del write_videofile de moviepy (preset medium, crf 18 + bitrate).
+    """
+    if timeline.get("maxrate"):
+        rate = ['-crf', str(timeline.get("crf", VIDEO_CRF)),
+                '-maxrate', timeline["maxrate"], '-bufsize', timeline["bufsize"]]
+    else:
+        rate = ['-b:v', timeline["bitrate"], '-crf', str(timeline.get("crf", VIDEO_CRF))]
+    metrics = ['-x264-params', 'ssim=1:psnr=1'] if ENCODER_METRICS else []
+    return [
+        '-c:v', 'libx264', '-preset', timeline.get("preset", VIDEO_PRESET),
+        *rate, *metrics,
+        '-pix_fmt', 'yuv420p', '-r', timeline["fps_expr"],
+    ]
+
+
+def encoder_stats(stderr: str, frames: int) -> dict | None:
+    """SSIM (Y) y PSNR global que x264 escribe al terminar, o None si no están."""
+    ssim = re.search(r"SSIM Mean Y:([\d.]+)", stderr or "")
+    psnr = re.search(r"PSNR Mean .*Global:([\d.]+|inf)", stderr or "")
+    if not ssim and not psnr:
+        return None
+    return {"frames": frames,
+            "ssim": float(ssim.group(1)) if ssim else None,
+            "psnr": float(psnr.group(1)) if psnr else None}
+
+
+def encoded_frames(stderr: str) -> int | None:
+    """Frames que x264 dice haber codificado (suma de I/P/B del resumen final), o None."""
+    counts = re.findall(r"frame [IPB]:(\d+)", stderr or "")
+    return sum(int(c) for c in counts) if counts else None
+
+
+def report_output(out_path, timeline: dict, stats: list):
+    """Registra tamaño conseguido frente al objetivo y la calidad media ponderada por frames."""
+    out_path = Path(out_path)
+    size_mb = out_path.stat().st_size / 1e6
+    total = timeline_duration(timeline)
+    msg = f"📦 {out_path.name}: {size_mb:.1f} MB ({size_mb * 8 / total:.1f} Mbps de media)"
+    if timeline.get("maxrate"):
+        target_mb = output_policy.target_size_bytes(total, timeline["bitrate"]) / 1e6
+        msg += f", objetivo {target_mb:.1f} MB (techo {timeline['maxrate']})"
+    for metric, fmt in (("ssim", "SSIM Y {:.4f}"), ("psnr", "PSNR {:.2f} dB")):
+        rows = [s for s in stats if s and s.get(metric) is not None]
+        frames = sum(s["frames"] for s in rows)
+        if frames:
+            msg += ", " + fmt.format(sum(s[metric] * s["frames"] for s in rows) / frames)
+    if stats and not all(stats):
+        msg += f" [calidad de {sum(1 for s in stats if s)}/{len(stats)} trozos codificados ahora]"
+    logging.info(msg)
+
+
+def intro_inputs(timeline: dict) -> list:
+    """El póster como vídeo de imagen fija a los FPS de salida."""
+    return ['-loop', '1', '-framerate', timeline["fps_expr"], '-t', str(timeline["intro"]["duration"]),
+            '-i', str(timeline["intro"]["path"])]
+
+
+def audio_inputs(timeline: dict, first_index: int) -> tuple[list, str, str | None]:
+    """Entradas de narración y música (en bucle). Devuelve (args, fuente_voz, fuente_música)."""
+    inputs = ['-i', str(timeline["voice"])]
+    music_src = None
+    if timeline.get("music"):
+        inputs += ['-stream_loop', '-1', '-i', str(timeline["music"])]
+        music_src = f"{first_index + 1}:a"
+    return inputs, f"{first_index}:a", music_src
+
+
+def build_command(timeline: dict, out_path) -> list:
+    """Comando ffmpeg completo: entradas + filtergraph + codificación."""
+    total = timeline_duration(timeline)
+    inputs = intro_inputs(timeline)
+    for clip in timeline["clips"]:
+        inputs += ['-t', str(clip["duration"]), '-i', str(clip["path"])]
+    a_inputs, voice_src, music_src = audio_inputs(timeline, 1 + len(timeline["clips"]))
+    inputs += a_inputs
+
+    parts = [intro_filter("0:v", timeline, "v0")]
+    for i, clip in enumerate(timeline["clips"], start=1):
+        parts.append(clip_filter(f"{i}:v", clip, timeline, f"v{i}"))
+    n = len(timeline["clips"]) + 1
+    parts.append("".join(f"[v{i}]" for i in range(n)) + f"concat=n={n}:v=1:a=0[vout]")
+    parts.append(audio_filter(voice_src, music_src, timeline, total, "aout"))
+
+    return [
+        'ffmpeg', '-y', '-hide_banner',
+        *inputs,
+        '-filter_complex', ";".join(parts),
+        '-map', '[vout]', '-map', '[aout]',
+        *video_encode_args(timeline),
+        *AUDIO_CODEC_ARGS,
+        '-t', str(total),
+        '-movflags', '+faststart',
+        str(out_path)
+    ]
+
+
+def run_ffmpeg(cmd: list, what: str = "ffmpeg"):
+    """Ejecuta ffmpeg y lanza RuntimeError con el final del log si falla."""
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors="replace")
+    if proc.returncode != 0:
+        tail = "\n".join(proc.stderr.strip().splitlines()[-8:])
+        raise RuntimeError(f"{what} falló (código {proc.returncode}):\n{tail}")
+    return proc.stderr
+
+
+def _file_signature(path) -> list:
+    st = Path(path).stat()
+    return [str(Path(path).resolve()), st.st_mtime_ns, st.st_size]
+
+
+def segment_frames(spec: dict, timeline: dict) -> int:
+    """Frames del tramo a los FPS de salida (los mismos que deja pasar trim=duration)."""
+    return max(1, math.ceil(spec["duration"] * timeline["fps"] - 1e-6))
+
+
+def segment_jobs(timeline: dict) -> list:
+    """
+    Trozos a codificar, en orden: la intro y cada clip, partidos en rangos de frames.
+
+    Cada trabajo es {"kind", "spec", "start_frame", "frames", "t0"}, con t0 el instante
+    de su primer frame en la línea de tiempo completa.
+    """
+    fps = timeline["fps"]
+    chunk = max(1, round(CHUNK_SECONDS * fps)) if CHUNK_SECONDS > 0 else None
+    jobs = []
+    offset = 0  # Frames acumulados de los tramos anteriores
+    for kind, spec in [("intro", timeline["intro"])] + [("clip", c) for c in timeline["clips"]]:
+        total = segment_frames(spec, timeline)
+        step = chunk or total
+        for start in range(0, total, step):
+            jobs.append({"kind": kind, "spec": spec, "start_frame": start,
+                         "frames": min(step, total - start), "t0": (offset + start) / fps})
+        offset += total
+    return jobs
+
+
+def job_overlays(job: dict, timeline: dict) -> list:
+    """Capas de la línea de tiempo visibles en algún frame del trozo."""
+    t0 = job["t0"]
+    t1 = t0 + job["frames"] / timeline["fps"]
+    return [o for o in timeline.get("overlays") or []
+            if o.get("start", 0.0) < t1 and (o.get("end") is None or o["end"] > t0)]
+
+
+def segment_key(job: dict, timeline: dict) -> str:
+    """Hash de todo lo que determina los píxeles del trozo: fichero de entrada, rango y parámetros."""
+    payload = {
+        "version": SEGMENT_VERSION,
+        "kind": job["kind"],
+        "input": _file_signature(job["spec"]["path"]),
+        "duration": job["spec"]["duration"],
+        "crop_path": job["spec"].get("crop_path"),
+        "frames": [job["start_frame"], job["frames"]],
+        "geometry": [timeline["width"], timeline["height"], timeline["square_size"], timeline.get("fit", "square"),
+                     timeline.get("background", "black")],
+        "encode": video_encode_args(timeline),
+    }
+    overlays = job_overlays(job, timeline)
+    if overlays:
+        # Las capas dependen del instante absoluto: el mismo clip en otra posición cambia
+        payload["t0"] = round(job["t0"], 6)
+        payload["overlays"] = [{**o, "path": _file_signature(o["path"])} for o in overlays]
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:20]
+
+
+def segment_source(job: dict, timeline: dict) -> tuple[list, str]:
+    """Entradas y filtergraph (salida [v]) que producen los frames normalizados del trozo."""
+    spec = job["spec"]
+    if job["kind"] == "intro":
+        # Imagen fija: todos los frames son iguales, basta con el recuento
+        inputs = intro_inputs(timeline)
+        graph = intro_filter("0:v", timeline, "v")
+    else:
+        inputs = []
+        if job["start_frame"]:
+            # Un cuarto de frame antes del primero: la búsqueda precisa de ffmpeg lo conserva
+            # aunque el redondeo del instante caiga justo encima (y con 60->30 salta el impar)
+            seek = (job["start_frame"] - 0.25) / timeline["fps"]
+            inputs += ['-ss', f"{seek:.6f}"]
+        inputs += ['-i', str(spec["path"])]
+        graph = clip_filter("0:v", spec, timeline, "v", t_offset=job["start_frame"] / timeline["fps"])
+    return inputs, graph
+
+
+def segment_command(job: dict, timeline: dict, out_path, threads: int = 0) -> list:
+    """Comando que codifica un solo trozo normalizado (sin audio) con un número exacto de frames."""
+    inputs, graph = segment_source(job, timeline)
+    return [
+        'ffmpeg', '-y', '-hide_banner',
+        *inputs,
+        '-filter_complex', graph,
+        '-map', '[v]',
+        '-frames:v', str(job["frames"]),
+        *video_encode_args(timeline),
+        '-threads', str(threads),
+        '-an',
+        str(out_path)
+    ]
+
+
+def composite_segment(job: dict, timeline: dict, overlays: list, out_path, threads: int = 0):
+    """Trozo con capas: ffmpeg (rawvideo rgb24) -> compositor NumPy -> ffmpeg (x264)."""
+    w, h = timeline["width"], timeline["height"]
+    inputs, graph = segment_source(job, timeline)
+    decode_cmd = [
+        'ffmpeg', '-v', 'error',
+        *inputs,
+        '-filter_complex', graph,
+        '-map', '[v]',
+        '-frames:v', str(job["frames"]),
+        # El grafo ya entrega CFR (filtro fps); sin passthrough el sincronizador de
+        # rawvideo duplica/descarta frames y el trozo se desfasa respecto a segment_command
+        '-fps_mode', 'passthrough',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-'
+    ]
+    encode_cmd = [
+        'ffmpeg', '-y', '-hide_banner',  # nivel info: x264 escribe ahí SSIM/PSNR
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{w}x{h}', '-r', timeline["fps_expr"], '-i', '-',
+        *video_encode_args(timeline),
+        '-threads', str(threads),
+        '-an',
+        str(out_path)
+    ]
+    # Capas propias por trozo: los buffers de trabajo no se comparten entre hilos
+    layers = [compositor.Layer.from_spec(o, w, h) for o in overlays]
+    comp = compositor.Compositor(w, h, layers)
+    frames = comp.pipe(decode_cmd, encode_cmd, job["t0"], timeline["fps"])
+    if frames != job["frames"]:
+        raise RuntimeError(f"Compositor: {frames} frames en vez de {job['frames']}")
+    return comp.encoder_log
+
+
+def render_segment(job: dict, timeline: dict, threads: int = 0) -> tuple[Path, bool, dict | None]:
+    """Devuelve (ruta del trozo, venía del caché, métricas de x264 si se ha codificado ahora)."""
+    SEGMENT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    out_path = SEGMENT_CACHE_DIR / f"{job['kind']}_{segment_key(job, timeline)}.mp4"
+    if out_path.exists() and out_path.stat().st_size > 0:
+        os.utime(out_path)  # Renovamos la antigüedad para la poda
+        return out_path, True, None
+    # Se escribe aparte y se renombra: un render abortado nunca deja un tramo "válido" a medias
+    part_path = out_path.with_name(out_path.stem + ".part.mp4")
+    overlays = job_overlays(job, timeline)
+    if overlays:
+        log = composite_segment(job, timeline, overlays, part_path, threads)
+    else:
+        what = f"Tramo {job['kind']} ({Path(job['spec']['path']).name}, frame {job['start_frame']})"
+        log = run_ffmpeg(segment_command(job, timeline, part_path, threads), what)
+    # -frames:v solo pone un tope: un trozo corto en caché desfasaría todo lo que va detrás
+    frames = encoded_frames(log)
+    if frames != job["frames"]:
+        part_path.unlink(missing_ok=True)
+        raise RuntimeError(f"Tramo {job['kind']} (frame {job['start_frame']}): {frames} frames codificados en vez de {job['frames']}")
+    os.replace(part_path, out_path)
+    return out_path, False, encoder_stats(log, job["frames"])
+
+
+def mux_audio_command(video_input: list, timeline: dict, out_path) -> list:
+    """Vídeo de `video_input` copiado tal cual (-c:v copy) + mezcla de audio de la línea de tiempo."""
+    total = timeline_duration(timeline)
+    a_inputs, voice_src, music_src = audio_inputs(timeline, 1)
+    return [
+        'ffmpeg', '-y', '-hide_banner',
+        *video_input,
+        *a_inputs,
+        '-filter_complex', audio_filter(voice_src, music_src, timeline, total, "aout"),
+        '-map', '0:v', '-map', '[aout]',
+        '-c:v', 'copy',
+        *AUDIO_CODEC_ARGS,
+        '-t', str(total),
+        '-movflags', '+faststart',
+        str(out_path)
+    ]
+
+
+def with_audio_gains(timeline: dict) -> dict:
+    """Con música, voz y música se normalizan a pico (como afx.AudioNormalize): mide las ganancias."""
+    if not timeline.get("music"):
+        return timeline
+    return {**timeline,
+            "voice_gain_db": peak_gain_db(timeline["voice"]),
+            "music_gain_db": peak_gain_db(timeline["music"])}
+
+
+def assemble(segment_paths: list, timeline: dict, out_path):
+    """Une los tramos con el demuxer concat (-c:v copy) y mezcla y añade el audio una sola vez."""
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", dir=SEGMENT_CACHE_DIR, delete=False, encoding="utf-8") as f:
+        for p in segment_paths:
+            f.write("file '" + Path(p).resolve().as_posix().replace("'", "'\\''") + "'\n")
+        list_path = Path(f.name)
+    try:
+        video_input = ['-f', 'concat', '-safe', '0', '-i', str(list_path)]
+        run_ffmpeg(mux_audio_command(video_input, timeline, out_path), "Ensamblado final")
+    finally:
+        list_path.unlink(missing_ok=True)
+
+
+def remux_audio(video_path, timeline: dict, out_path) -> Path:
+    """
+    Vía rápida cuando solo cambian narración o música: reutiliza el vídeo ya codificado de
+    `video_path` (-c:v copy) y rehace solo la mezcla de audio. Segundos en vez de un render.
+    `out_path` puede ser el mismo `video_path` (se escribe aparte y se renombra).
+    """
+    video_path, out_path = Path(video_path), Path(out_path)
+    timeline = with_audio_gains(timeline)
+    part_path = out_path.with_name(out_path.stem + ".part.mp4")
+    run_ffmpeg(mux_audio_command(['-i', str(video_path)], timeline, part_path), "Remux de audio")
+    os.replace(part_path, out_path)
+    return out_path
+
+
+def render_segmented(timeline: dict, out_path, workers: int = RENDER_WORKERS) -> Path:
+    """Render por trozos cacheados codificados en paralelo + ensamblado sin recodificar."""
+    jobs = segment_jobs(timeline)
+    workers = max(1, min(workers, len(jobs)))
+    # Repartimos los hilos de x264 entre los procesos para no sobresuscribir la CPU
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    logging.info(f"⚙️ {len(jobs)} trozos con {workers} procesos ffmpeg ({threads} hilos c/u)...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda job: render_segment(job, timeline, threads), jobs))
+    hits = sum(cached for _, cached, _ in results)
+    logging.info(f"🧱 Trozos: {hits}/{len(jobs)} desde caché, {len(jobs) - hits} codificados.")
+    assemble([path for path, _, _ in results], timeline, out_path)
+    report_output(out_path, timeline, [stats for _, _, stats in results])
+    return Path(out_path)
+
+
+def profile_timeline(timeline: dict, name: str) -> dict:
+    """La línea de tiempo en otro formato de salida (mismo lado corto, mismas capas)."""
+    tl = {**timeline, **output_policy.profile_geometry(name, timeline["square_size"])}
+    if timeline.get("maxrate"):
+        # Techo VBV proporcional a los píxeles del formato
+        tl.update(output_policy.rate_control(tl["width"], tl["height"], tl["fps"]))
+    return tl
+
+
+def overlay_chain(base: str, overlay_srcs: list, timeline: dict, label: str) -> str:
+    """Capas PNG sobre [base] con el filtro overlay, visibles en [start, end)."""
+    w, h = timeline["width"], timeline["height"]
+    parts, current = [], base
+    for i, (src, spec) in enumerate(overlay_srcs):
+        with Image.open(spec["path"]) as img:
+            x, y, ow = compositor.layer_geometry(spec, w, h, img.width)
+        end = spec.get("end")
+        enable = f"gte(t,{spec.get('start', 0.0)})" + (f"*lt(t,{end})" if end is not None else "")
+        nxt = f"{label}_o{i}"
+        parts.append(f"[{src}]scale={ow}:-1,format=rgba[{nxt}s];"
+                     f"[{current}][{nxt}s]overlay={x}:{y}:enable='{enable}'[{nxt}]")
+        current = nxt
+    parts.append(f"[{current}]format=yuv420p[{label}]")
+    return ";".join(parts)
+
+
+def build_profiles_command(timeline: dict, outputs: list) -> list:
+    """
+    Un solo ffmpeg para varios formatos: cada entrada se decodifica una vez y se reparte
+    con split; `outputs` es [(línea de tiempo del formato, ruta)].
+    """
+    n_out = len(outputs)
+    total = timeline_duration(timeline)
+    clips = timeline["clips"]
+    overlays = timeline.get("overlays") or []
+
+    inputs = intro_inputs(timeline)
+    for clip in clips:
+        inputs += ['-t', str(clip["duration"]), '-i', str(clip["path"])]
+    a_inputs, voice_src, music_src = audio_inputs(timeline, 1 + len(clips))
+    inputs += a_inputs
+    first_overlay = 1 + len(clips) + (2 if music_src else 1)
+    for o in overlays:
+        inputs += ['-i', str(o["path"])]
+
+    def fan(src: str, name: str) -> tuple[str, list]:
+        labels = [f"{name}_{p}" for p in range(n_out)]
+        return f"[{src}]split={n_out}" + "".join(f"[{l}]" for l in labels), labels
+
+    parts = []
+    sources = []  # Por entrada visual: etiquetas de sus copias (una por formato)
+    for i in range(1 + len(clips)):
+        graph, labels = fan(f"{i}:v", f"s{i}")
+        parts.append(graph)
+        sources.append(labels)
+    overlay_copies = []
+    for k in range(len(overlays)):
+        graph, labels = fan(f"{first_overlay + k}:v", f"ov{k}")
+        parts.append(graph)
+        overlay_copies.append(labels)
+
+    for p, (tl, _) in enumerate(outputs):
+        parts.append(intro_filter(sources[0][p], tl, f"p{p}v0"))
+        for i, clip in enumerate(clips, start=1):
+            parts.append(clip_filter(sources[i][p], clip, tl, f"p{p}v{i}"))
+        n = len(clips) + 1
+        parts.append("".join(f"[p{p}v{i}]" for i in range(n)) + f"concat=n={n}:v=1:a=0[p{p}cat]")
+        srcs = [(overlay_copies[k][p], o) for k, o in enumerate(overlays)]
+        parts.append(overlay_chain(f"p{p}cat", srcs, tl, f"vout{p}"))
+
+    parts.append(audio_filter(voice_src, music_src, timeline, total, "amixed"))
+    parts.append(f"[amixed]asplit={n_out}" + "".join(f"[aout{p}]" for p in range(n_out)))
+
+    cmd = ['ffmpeg', '-y', '-hide_banner', *inputs, '-filter_complex', ";".join(parts)]
+    for p, (tl, path) in enumerate(outputs):
+        cmd += ['-map', f'[vout{p}]', '-map', f'[aout{p}]',
+                *video_encode_args(tl), *AUDIO_CODEC_ARGS,
+                '-t', str(total), '-movflags', '+faststart', str(path)]
+    return cmd
+
+
+def render_profiles(timeline: dict, outputs: dict) -> list:
+    """
+    Renderiza la línea de tiempo en varios formatos de una pasada: `outputs` = {formato: ruta},
+    p. ej. {"9x16": final, "1x1": ..., "16x9": ...}. Devuelve las rutas escritas.
+    """
+    timeline = with_audio_gains(timeline)
+    jobs = [(profile_timeline(timeline, name), Path(path)) for name, path in outputs.items()]
+    for _, path in jobs:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    logging.info(f"🎬 Render ffmpeg en {len(jobs)} formatos de una pasada: "
+                 + ", ".join(f"{tl['profile']} {tl['width']}x{tl['height']}" for tl, _ in jobs))
+    log = run_ffmpeg(build_profiles_command(timeline, jobs), "Render multiformato")
+
+    # x264 escribe sus estadísticas al cerrar cada codificador, en el orden de las salidas
+    blocks = re.split(r"(?=SSIM Mean Y:)", log)[1:]
+    frames = math.ceil(timeline_duration(timeline) * timeline["fps"])
+    for i, (tl, path) in enumerate(jobs):
+        stats = encoder_stats(blocks[i], frames) if len(blocks) == len(jobs) else None
+        report_output(path, tl, [stats] if stats else [])
+    return [path for _, path in jobs]
+
+
+def prune_segment_cache(max_age_days: float = SEGMENT_CACHE_MAX_AGE_DAYS):
+    """
+    Borra los tramos (y sprites de subtítulos) no usados en `max_age_days` días, y los restos
+    .part de renders abortados con más de PART_GRACE_HOURS (los recientes pueden estar en uso).
+    """
+    if not SEGMENT_CACHE_DIR.exists():
+        return
+    now = time.time()
+    cutoff = now - max_age_days * 86400
+    part_cutoff = now - PART_GRACE_HOURS * 3600
+    removed = 0
+    for item in SEGMENT_CACHE_DIR.rglob("*"):
+        try:
+            if not item.is_file():
+                continue
+            mtime = item.stat().st_mtime
+            if mtime < cutoff or (".part" in item.name and mtime < part_cutoff):
+                item.unlink()
+                removed += 1
+        except OSError as e:
+            logging.warning(f"No se pudo borrar {item.name} del caché de tramos: {e}")
+    if removed:
+        logging.info(f"🧹 Caché de tramos: {removed} ficheros antiguos eliminados.")
+
+
+def render(timeline: dict, out_path) -> Path:
+    """Renderiza la línea de tiempo completa en `out_path` (por tramos si SEGMENT_CACHE)."""
+    out_path = Path(out_path)
+    # Normalización a pico como afx.AudioNormalize (pasada solo de audio, muy barata)
+    timeline = with_audio_gains(timeline)
+    logging.info(f"🎬 Render ffmpeg: {len(timeline['clips'])} clips + intro, "
+                 f"{timeline['width']}x{timeline['height']} @ {timeline['fps_expr']} fps...")
+    if SEGMENT_CACHE or timeline.get("overlays"):
+        # Las capas solo se pueden mezclar por trozos
+        return render_segmented(timeline, out_path, timeline.get("workers", RENDER_WORKERS))
+    log = run_ffmpeg(build_command(timeline, out_path), "Render ffmpeg")
+    frames = math.ceil(timeline_duration(timeline) * timeline["fps"])
+    report_output(out_path, timeline, [encoder_stats(log, frames)])
+    return out_path
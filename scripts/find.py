@@ -20,6 +20,8 @@ from movie_utils import (
     _load_state, is_published, api_get, get_synopsis_chain, enrich_movie_basic,
     load_config, get_deep_research_data, log_discard, _is_non_latin
 )
+import trailer_probe
+import trailer_fingerprint
 
 # --- Configuración ---
 ROOT = Path(__file__).resolve().parents[1]
@@ -374,7 +376,23 @@ def find_and_select_next():
         item['score'] = score
 
     enriched.sort(key=lambda x: x.get('score', 0), reverse=True)
-    selected = enriched[0]
+
+    # Sondeo del tráiler (sin descargar, cacheado por videoId): descartamos los no disponibles,
+    # con restricción de edad o re-subidas ya detectadas por huella antes de seleccionarlos
+    selected = None
+    for item in enriched:
+        usable, reason = trailer_probe.is_usable(item.get('trailer_url'))
+        if usable and trailer_fingerprint.is_known_duplicate(trailer_probe.video_id_from_url(item.get('trailer_url'))):
+            usable, reason = False, "Tráiler re-subido de uno ya publicado (huella)"
+        if usable:
+            selected = item
+            break
+        logging.info(f"   [x] Descartado '{item.get('titulo', 'N/A')}': {reason}.")
+        log_discard(item.get('titulo', 'N/A'), reason, item.get('tmdb_id'))
+
+    if not selected:
+        logging.info("❌ Ningún candidato tiene un tráiler descargable.")
+        return None
     # Usar el score ya calculado para evitar log duplicado
     final_score = selected['score']
 
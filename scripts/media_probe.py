@@ -0,0 +1,139 @@
+# scripts/media_probe.py
+"""
+Una única lectura con ffprobe por fichero multimedia, reutilizada por todas las fases.
+
+El resultado (duración, fps, tamaño, códec, audio, instantes de inicio y, si se piden, keyframes) se
+cachea en memoria y en assets_manifest.json ("media_probes"), indexado por ruta y
+validado con mtime + tamaño: si el fichero cambia, se vuelve a sondear.
+
+    info = media_probe.probe(path)             # dict o None
+    info = media_probe.probe(path, keyframes=True)
+"""
+import json
+import logging
+import subprocess
+import threading
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+STATE_DIR = ROOT / "output" / "state"
+MANIFEST_FILE = STATE_DIR / "assets_manifest.json"
+
+_CACHE = {}
+_LOCK = threading.Lock()
+
+
+def _key(path: Path) -> str:
+    try:
+        return str(path.resolve().relative_to(ROOT)).replace("\\", "/")
+    except ValueError:
+        return str(path.resolve())
+
+
+def _parse_rate(rate: str | None) -> float:
+    if not rate or rate in ("0/0", "N/A"):
+        return 0.0
+    if "/" in rate:
+        num, den = map(float, rate.split("/"))
+        return num / den if den else 0.0
+    return float(rate)
+
+
+def _ffprobe(path: Path) -> dict:
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'format=duration,size,bit_rate,start_time:stream=index,codec_type,codec_name,width,height,r_frame_rate,avg_frame_rate,pix_fmt,duration,start_time',
+        '-of', 'json',
+        str(path)
+    ]
+    data = json.loads(subprocess.check_output(cmd).decode('utf-8'))
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = [s for s in streams if s.get("codec_type") == "audio"]
+    fmt = data.get("format", {})
+    fps = _parse_rate(video.get("avg_frame_rate")) or _parse_rate(video.get("r_frame_rate"))
+    start = float(fmt.get("start_time") or 0)
+    return {
+        "duration": float(fmt.get("duration") or video.get("duration") or 0),
+        "fps": round(fps, 3),
+        "width": int(video.get("width") or 0),
+        "height": int(video.get("height") or 0),
+        "vcodec": video.get("codec_name"),
+        "pix_fmt": video.get("pix_fmt"),
+        "bit_rate": int(fmt.get("bit_rate") or 0),
+        "audio_streams": [{"codec": a.get("codec_name"), "index": a.get("index")} for a in audio],
+        # Origen de tiempos de ffmpeg -ss (contenedor) y primer PTS del vídeo
+        "start_time": start,
+        "video_start_time": float(video.get("start_time") or start),
+    }
+
+
+def _keyframes(path: Path) -> list:
+    """Instantes de keyframe leyendo solo flags de paquetes (sin decodificar)."""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        str(path)
+    ]
+    output = subprocess.check_output(cmd).decode('utf-8')
+    keyframes = []
+    for line in output.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) >= 2 and 'K' in parts[1] and parts[0] not in ('', 'N/A'):
+            keyframes.append(float(parts[0]))
+    return sorted(keyframes)
+
+
+def _load_manifest_probes() -> dict:
+    if not MANIFEST_FILE.exists():
+        return {}
+    try:
+        return json.loads(MANIFEST_FILE.read_text(encoding="utf-8")).get("media_probes", {})
+    except (json.JSONDecodeError, OSError):
+        return {}
+
+
+def _store_manifest_probe(key: str, info: dict):
+    """Guarda el sondeo en el manifiesto (solo si el manifiesto ya existe)."""
+    if not MANIFEST_FILE.exists():
+        return
+    try:
+        manifest = json.loads(MANIFEST_FILE.read_text(encoding="utf-8"))
+        manifest.setdefault("media_probes", {})[key] = info
+        MANIFEST_FILE.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    except Exception as e:
+        logging.warning(f"No se pudo guardar el sondeo en el manifiesto: {e}")
+
+
+def probe(path, keyframes: bool = False) -> dict | None:
+    """Info del fichero (desde caché si no ha cambiado). None si ffprobe falla."""
+    path = Path(path)
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    key = _key(path)
+
+    with _LOCK:
+        info = _CACHE.get(key) or _load_manifest_probes().get(key)
+        fresh = info and info.get("mtime_ns") == stat.st_mtime_ns and info.get("size") == stat.st_size
+        fresh = fresh and "video_start_time" in info  # Sondeos antiguos, sin instantes de inicio
+        if fresh and (not keyframes or "keyframes" in info):
+            _CACHE[key] = info
+            return info
+
+        try:
+            new_info = dict(info) if fresh else _ffprobe(path)
+            if keyframes:
+                new_info["keyframes"] = _keyframes(path)
+        except Exception as e:
+            logging.warning(f"No se pudo sondear {path.name} con ffprobe: {e}")
+            return None
+
+        new_info["mtime_ns"] = stat.st_mtime_ns
+        new_info["size"] = stat.st_size
+        _CACHE[key] = new_info
+        _store_manifest_probe(key, new_info)
+        return new_info
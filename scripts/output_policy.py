@@ -0,0 +1,161 @@
+# scripts/output_policy.py
+"""
+Política de salida del Short: FPS, resolución y bitrate a partir del tráiler original.
+
+El coste de render escala con frames x píxeles, así que:
+  - Se mantienen los FPS nativos si son una cadencia estándar (23.976 no se sube a 30,
+    que solo duplicaría frames). Por encima de MAX_FPS se divide a la mitad (60 -> 30).
+  - El ancho se limita a MAX_OUTPUT_WIDTH (un tráiler 4K da 1080x1920, no 2160x3840).
+  - El bitrate sale de bits por píxel y frame sobre la resolución y FPS finales.
+  - Control de tasa "capped_crf": CRF con techo VBV (-maxrate/-bufsize) calculado para un
+    tamaño objetivo por segundo y píxel. YouTube recodifica todo lo que se sube, así que los
+    bits por encima de su recomendación (~8 Mbps a 1080p30) solo alargan escritura y subida.
+
+    policy = output_policy.decide(fps, w, h)   # dict con fps, fps_expr, width, height, bitrate
+    output_policy.record(policy)               # lo deja en assets_manifest.json ("output_policy")
+    output_policy.profile_geometry("16x9", policy["width"])   # otros formatos (ver PROFILES)
+"""
+import json
+import logging
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+STATE_DIR = ROOT / "output" / "state"
+MANIFEST_FILE = STATE_DIR / "assets_manifest.json"
+
+# Cadencias estándar aceptadas tal cual (expresión exacta para ffmpeg)
+SUPPORTED_FPS = {
+    24000 / 1001: "24000/1001",
+    24.0: "24",
+    25.0: "25",
+    30000 / 1001: "30000/1001",
+    30.0: "30",
+    48.0: "48",
+    50.0: "50",
+    60000 / 1001: "60000/1001",
+    60.0: "60",
+}
+FPS_TOLERANCE = 0.01
+MAX_FPS = 30.0                # Para un Short no compensa pagar 60 fps
+DEFAULT_FPS = 30.0            # Si no sabemos los FPS del tráiler
+
+MAX_OUTPUT_WIDTH = 1080       # Ancho máximo del vertical (alto = ancho * 16/9)
+DEFAULT_SOURCE_SIZE = (1920, 1080)
+
+BITS_PER_PIXEL = 0.19         # ~12 Mbps a 1080x1920@30, como el valor fijo histórico
+BITRATE_STEP_K = 500
+
+# "capped_crf" (CRF con techo VBV hacia un tamaño objetivo) o "crf" (crf 18 sin techo, el histórico)
+RATE_CONTROL = "capped_crf"
+TARGET_BITS_PER_PIXEL = 0.13  # Media objetivo: ~8 Mbps a 1080x1920@30 (~29 MB en 28 s)
+CAPPED_CRF = "20"
+MAXRATE_FACTOR = 1.5          # Techo VBV sobre la media objetivo (deja picos en cortes y grano)
+BUFSIZE_FACTOR = 2.0          # Buffer VBV = 2 x techo
+AUDIO_KBPS = 192              # Igual que ffmpeg_render.AUDIO_CODEC_ARGS
+
+# Formatos de salida: (ancho, alto) relativos y cómo entran los clips.
+#   "square": cuadrado central sobre negro (el 9:16 de siempre; en 1:1 lo llena)
+#   "cover":  el clip escalado y recortado para llenar el frame (16:9 = el tráiler tal cual)
+# El lado corto del frame es siempre el ancho del 9:16, así que todos comparten escala.
+PROFILES = {
+    "9x16": (9, 16, "square"),
+    "1x1": (1, 1, "square"),
+    "16x9": (16, 9, "cover"),
+}
+
+
+def _even(n: int) -> int:
+    return n - (n % 2)
+
+
+def choose_fps(src_fps: float | None) -> tuple[float, str]:
+    """Devuelve (fps, expresión ffmpeg) para unos FPS de origen."""
+    if not src_fps or src_fps <= 0:
+        return DEFAULT_FPS, SUPPORTED_FPS[DEFAULT_FPS]
+
+    match = next((f for f in SUPPORTED_FPS if abs(f - src_fps) <= FPS_TOLERANCE), None)
+    if match is not None:
+        # 50 -> 25, 59.94 -> 29.97, 60 -> 30, 48 -> 24
+        while match > MAX_FPS and (match / 2) in SUPPORTED_FPS:
+            match /= 2
+        if match <= MAX_FPS:
+            return match, SUPPORTED_FPS[match]
+
+    # Cadencia rara (VFR, 15 fps, etc.): la estándar más cercana sin pasar de MAX_FPS
+    allowed = [f for f in SUPPORTED_FPS if f <= MAX_FPS]
+    nearest = min(allowed, key=lambda f: abs(f - src_fps))
+    return nearest, SUPPORTED_FPS[nearest]
+
+
+def choose_resolution(src_w: int | None, src_h: int | None) -> tuple[int, int]:
+    """Tamaño vertical 9:16: ancho = lado corto del tráiler, limitado a MAX_OUTPUT_WIDTH."""
+    src_w = src_w or DEFAULT_SOURCE_SIZE[0]
+    src_h = src_h or DEFAULT_SOURCE_SIZE[1]
+    width = _even(min(src_w, src_h, MAX_OUTPUT_WIDTH))
+    height = _even(int(width * 16 / 9))
+    return width, height
+
+
+def choose_bitrate(width: int, height: int, fps: float, bits_per_pixel: float = BITS_PER_PIXEL) -> str:
+    """Bitrate en formato ffmpeg ("11500k") proporcional a píxeles por segundo."""
+    kbps = width * height * fps * bits_per_pixel / 1000
+    kbps = max(BITRATE_STEP_K, round(kbps / BITRATE_STEP_K) * BITRATE_STEP_K)
+    return f"{kbps}k"
+
+
+def _kbps(rate: str) -> int:
+    return int(rate.rstrip("k"))
+
+
+def rate_control(width: int, height: int, fps: float) -> dict:
+    """Ajustes de control de tasa (claves de la línea de tiempo) según RATE_CONTROL."""
+    if RATE_CONTROL != "capped_crf":
+        return {"bitrate": choose_bitrate(width, height, fps)}
+    target = _kbps(choose_bitrate(width, height, fps, TARGET_BITS_PER_PIXEL))
+    maxrate = round(target * MAXRATE_FACTOR)
+    return {
+        "rate_control": "capped_crf",
+        "bitrate": f"{target}k",
+        "crf": CAPPED_CRF,
+        "maxrate": f"{maxrate}k",
+        "bufsize": f"{round(maxrate * BUFSIZE_FACTOR)}k",
+    }
+
+
+def profile_geometry(name: str, short_side: int) -> dict:
+    """Claves de geometría de la línea de tiempo para un formato de PROFILES."""
+    rw, rh, fit = PROFILES[name]
+    long_side = _even(int(short_side * max(rw, rh) / min(rw, rh)))
+    width, height = (short_side, long_side) if rw <= rh else (long_side, short_side)
+    return {"profile": name, "width": width, "height": height, "square_size": short_side, "fit": fit}
+
+
+def target_size_bytes(duration: float, bitrate: str) -> int:
+    """Tamaño esperado del MP4 (vídeo a la media objetivo + audio)."""
+    return int(duration * (_kbps(bitrate) + AUDIO_KBPS) * 1000 / 8)
+
+
+def decide(src_fps: float | None, src_w: int | None, src_h: int | None) -> dict:
+    """Decisión completa de salida para un tráiler."""
+    fps, fps_expr = choose_fps(src_fps)
+    width, height = choose_resolution(src_w, src_h)
+    return {
+        "fps": fps,
+        "fps_expr": fps_expr,
+        "width": width,
+        "height": height,
+        **rate_control(width, height, fps),
+        "source": {"fps": src_fps, "width": src_w, "height": src_h},
+    }
+
+
+def record(policy: dict):
+    """Guarda la decisión en el manifiesto (solo si el manifiesto ya existe)."""
+    if not MANIFEST_FILE.exists():
+        return
+    try:
+        manifest = json.loads(MANIFEST_FILE.read_text(encoding="utf-8"))
+        manifest["output_policy"] = policy
+        MANIFEST_FILE.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    except Exception as e:
+        logging.warning(f"No se pudo guardar la política de salida en el manifiesto: {e}")
@@ -0,0 +1,137 @@
+# scripts/trailer_fingerprint.py
+"""
+Índice persistente de huellas de tráileres para detectar re-subidas.
+
+El mismo tráiler lo suben varios canales con distinto videoId, y el control de
+duplicados por tmdb_id llega tarde (después de TMDB). La huella es una secuencia
+corta de hashes de 64 bits (clip_analysis.analyze_trailer, ~1 por segundo) y la
+búsqueda usa un índice multi-hash: cada hash se parte en 4 trozos de 16 bits y
+dos hashes a distancia <= 3 comparten al menos un trozo exacto (palomar), así que
+solo se comparan bit a bit los candidatos que caen en el mismo cubo.
+"""
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+import clip_analysis
+
+ROOT = Path(__file__).resolve().parents[1]
+STATE_DIR = ROOT / "output" / "state"
+FINGERPRINT_FILE = STATE_DIR / "trailer_fingerprints.json"
+
+CHUNKS = 4                # 64 bits -> 4 trozos de 16
+MATCH_BITS = CHUNKS - 1   # Distancia máxima por hash que garantiza el palomar
+MIN_MATCH_RATIO = 0.5     # Fracción de hashes de la consulta que deben casar
+MIN_HASHES = 8            # Huellas más cortas no son fiables (tráiler casi negro)
+MAX_ENTRIES = 500
+
+
+def _load() -> dict:
+    if not FINGERPRINT_FILE.exists():
+        return {"entries": [], "duplicates": {}}
+    try:
+        data = json.loads(FINGERPRINT_FILE.read_text(encoding="utf-8"))
+        data.setdefault("entries", [])
+        data.setdefault("duplicates", {})
+        return data
+    except json.JSONDecodeError:
+        logging.error(f"Error al decodificar {FINGERPRINT_FILE}, se tratará como vacío.")
+        return {"entries": [], "duplicates": {}}
+
+
+def _save(data: dict):
+    try:
+        STATE_DIR.mkdir(parents=True, exist_ok=True)
+        data["entries"] = data["entries"][-MAX_ENTRIES:]
+        FINGERPRINT_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    except Exception as e:
+        logging.error(f"Error al guardar índice de huellas: {e}")
+
+
+def _chunks(h: int):
+    return [(i, (h >> (16 * i)) & 0xFFFF) for i in range(CHUNKS)]
+
+
+def _build_index(entries: list) -> dict:
+    """(posición, trozo) -> {índice de entrada}."""
+    index = defaultdict(set)
+    for e_idx, entry in enumerate(entries):
+        for hx in entry.get("hashes", []):
+            for key in _chunks(int(hx, 16)):
+                index[key].add(e_idx)
+    return index
+
+
+def find_match(fingerprint, exclude_video_id: str | None = None) -> dict | None:
+    """
+    Busca un tráiler ya indexado que sea casi idéntico a `fingerprint` (lista de uint64).
+
+    Devuelve la entrada con mayor proporción de hashes coincidentes si supera
+    MIN_MATCH_RATIO, o None.
+    """
+    if len(fingerprint) < MIN_HASHES:
+        return None
+    data = _load()
+    entries = data["entries"]
+    if not entries:
+        return None
+
+    index = _build_index(entries)
+    stored = {}                 # entrada -> array uint64 (solo las que salen como candidatas)
+    matched = defaultdict(int)  # entrada -> nº de hashes de la consulta que casan
+    for h in fingerprint:
+        h = int(h)
+        candidates = set()
+        for key in _chunks(h):
+            candidates |= index.get(key, set())
+        for e_idx in candidates:
+            if e_idx not in stored:
+                stored[e_idx] = np.array([int(x, 16) for x in entries[e_idx]["hashes"]], dtype=np.uint64)
+            if clip_analysis.popcount(stored[e_idx] ^ np.uint64(h)).min() <= MATCH_BITS:
+                matched[e_idx] += 1
+
+    best, best_ratio = None, 0.0
+    for e_idx, count in matched.items():
+        entry = entries[e_idx]
+        if exclude_video_id and entry.get("video_id") == exclude_video_id:
+            continue
+        ratio = count / len(fingerprint)
+        if ratio > best_ratio:
+            best, best_ratio = entry, ratio
+
+    if best is not None and best_ratio >= MIN_MATCH_RATIO:
+        logging.info(f"🧬 Huella coincide al {best_ratio:.0%} con '{best.get('title')}' ({best.get('video_id')}).")
+        return {**best, "match_ratio": round(best_ratio, 3)}
+    return None
+
+
+def add(video_id: str, tmdb_id, title: str, fingerprint, clips: list | None = None):
+    """Guarda (o actualiza) la huella de un tráiler procesado y los clips que salieron de él."""
+    if len(fingerprint) < MIN_HASHES:
+        return
+    data = _load()
+    data["entries"] = [e for e in data["entries"] if e.get("video_id") != video_id]
+    data["entries"].append({
+        "video_id": video_id,
+        "tmdb_id": tmdb_id,
+        "title": title,
+        "hashes": [f"{int(h):016x}" for h in fingerprint],
+        "clips": clips or [],
+        "indexed_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+    })
+    _save(data)
+
+
+def mark_duplicate(video_id: str, original_video_id: str):
+    """Recuerda que `video_id` es una re-subida, para que find.py no lo vuelva a elegir."""
+    data = _load()
+    data["duplicates"][video_id] = original_video_id
+    _save(data)
+
+
+def is_known_duplicate(video_id: str) -> bool:
+    return video_id in _load()["duplicates"]
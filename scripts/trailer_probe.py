@@ -0,0 +1,204 @@
+# scripts/trailer_probe.py
+"""
+Sondeo previo de tráileres con yt-dlp (extract_info sin descargar) y caché por videoId.
+
+Sirve para dos cosas:
+  - Elegir a la primera la estrategia de autenticación (cookies.txt, cookies de
+    Chrome o sin cookies) y el formato, en vez de encadenar descargas fallidas.
+  - Permitir que find.py descarte tráileres no disponibles o con restricción de
+    edad antes de seleccionarlos.
+
+Uso directo:
+  python scripts/trailer_probe.py <url>
+"""
+import json
+import logging
+import re
+import sys
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+import yt_dlp
+
+ROOT = Path(__file__).resolve().parents[1]
+STATE_DIR = ROOT / "output" / "state"
+PROBE_CACHE_FILE = STATE_DIR / "trailer_probe_cache.json"
+COOKIES_FILE = ROOT / "www.youtube.com_cookies.txt"
+
+PROBE_TTL_HOURS = 72          # Un vídeo puede pasar a privado; no fiarse del caché eternamente
+ERROR_TTL_HOURS = 6           # Los fallos se reintentan antes
+AGE_LIMIT_BLOCK = 18
+BLOCKED_AVAILABILITY = {"private", "premium_only", "subscriber_only", "needs_auth"}
+
+# Orden de preferencia, igual que el fallback histórico de download_trailer
+STRATEGIES = ["cookiefile", "chrome", "none"]
+
+# Errores que indican que otra estrategia de cookies podría funcionar
+_AUTH_ERRORS = ("sign in", "403", "bot", "cookies", "login")
+
+
+def video_id_from_url(url: str) -> str:
+    """Extrae el videoId de una URL de YouTube (o devuelve la URL tal cual si no es de YouTube)."""
+    m = re.search(r"(?:v=|youtu\.be/|/shorts/|/embed/)([\w-]{11})", url or "")
+    return m.group(1) if m else (url or "")
+
+
+def strategy_opts(strategy: str | None) -> dict:
+    """Opciones de yt-dlp para una estrategia de autenticación."""
+    if strategy == "cookiefile" and COOKIES_FILE.exists():
+        return {'cookiefile': str(COOKIES_FILE)}
+    if strategy == "chrome":
+        return {'cookiesfrombrowser': ('chrome', )}
+    return {}
+
+
+def _load_cache() -> dict:
+    if not PROBE_CACHE_FILE.exists():
+        return {}
+    try:
+        return json.loads(PROBE_CACHE_FILE.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        logging.error(f"Error al decodificar {PROBE_CACHE_FILE}, se tratará como vacío.")
+        return {}
+
+
+def _save_cache(cache: dict):
+    try:
+        STATE_DIR.mkdir(parents=True, exist_ok=True)
+        PROBE_CACHE_FILE.write_text(json.dumps(cache, ensure_ascii=False, indent=2), encoding="utf-8")
+    except Exception as e:
+        logging.error(f"Error al guardar caché de sondeo: {e}")
+
+
+def _is_fresh(entry: dict) -> bool:
+    try:
+        probed = datetime.fromisoformat(entry["probed_at"].replace("Z", "+00:00"))
+    except (KeyError, ValueError):
+        return False
+    ttl = PROBE_TTL_HOURS if entry.get("ok") else ERROR_TTL_HOURS
+    return datetime.now(timezone.utc) - probed < timedelta(hours=ttl)
+
+
+def _summarize(info: dict) -> dict:
+    """Se queda solo con lo necesario para decidir (el info_dict completo pesa cientos de KB)."""
+    formats = []
+    for f in info.get("formats") or []:
+        formats.append({
+            "format_id": f.get("format_id"),
+            "ext": f.get("ext"),
+            "height": f.get("height"),
+            "fps": f.get("fps"),
+            "vcodec": f.get("vcodec"),
+            "acodec": f.get("acodec"),
+            "filesize": f.get("filesize") or f.get("filesize_approx"),
+            "tbr": f.get("tbr"),
+        })
+    return {
+        "title": info.get("title"),
+        "duration": info.get("duration"),
+        "availability": info.get("availability"),
+        "age_limit": info.get("age_limit") or 0,
+        "live_status": info.get("live_status"),
+        "formats": formats,
+    }
+
+
+def probe(url: str, force: bool = False) -> dict:
+    """
+    Devuelve la info resumida del vídeo (desde caché si es reciente).
+
+    Claves: ok, strategy, needs_auth, reason, duration, availability, age_limit, formats...
+    """
+    vid = video_id_from_url(url)
+    cache = _load_cache()
+    entry = cache.get(vid)
+    if entry and not force and _is_fresh(entry):
+        return entry
+
+    base_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'skip_download': True,
+        'no_playlist': True,
+        'nocheckcertificate': True,
+        'forceipv4': True,
+    }
+    strategies = [s for s in STRATEGIES if s != "cookiefile" or COOKIES_FILE.exists()]
+
+    entry = {"ok": False, "strategy": None, "needs_auth": False, "reason": "sin sondear"}
+    for strategy in strategies:
+        try:
+            with yt_dlp.YoutubeDL({**base_opts, **strategy_opts(strategy)}) as ydl:
+                info = ydl.extract_info(url, download=False)
+            entry = {
+                "ok": True,
+                "strategy": strategy,
+                "needs_auth": entry["needs_auth"],
+                "reason": "",
+                **_summarize(info),
+            }
+            break
+        except Exception as e:
+            msg = str(e).lower()
+            entry["reason"] = str(e)[:300]
+            if any(k in msg for k in _AUTH_ERRORS):
+                entry["needs_auth"] = True
+                logging.info(f"🔐 Sondeo '{strategy}' rechazado por autenticación. Probando siguiente estrategia...")
+                continue
+            # Vídeo borrado, privado, bloqueado por región...: otra cookie no lo arregla
+            break
+
+    entry["video_id"] = vid
+    entry["probed_at"] = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    cache[vid] = entry
+    _save_cache(cache)
+    if entry["ok"]:
+        logging.info(f"🔎 Sondeo {vid}: {entry.get('duration')}s, estrategia '{entry['strategy']}', {len(entry['formats'])} formatos.")
+    else:
+        logging.info(f"🔎 Sondeo {vid}: no disponible ({entry['reason'][:80]}).")
+    return entry
+
+
+def is_usable(url: str) -> tuple[bool, str]:
+    """¿Se puede descargar y usar este tráiler? Devuelve (usable, motivo_si_no)."""
+    if not url:
+        return False, "Sin URL de tráiler"
+    entry = probe(url)
+    if not entry.get("ok"):
+        return False, f"Tráiler no disponible: {entry.get('reason', '')[:120]}"
+    if (entry.get("age_limit") or 0) >= AGE_LIMIT_BLOCK:
+        return False, f"Tráiler con restricción de edad ({entry['age_limit']}+)"
+    if entry.get("availability") in BLOCKED_AVAILABILITY:
+        return False, f"Tráiler con disponibilidad restringida ({entry['availability']})"
+    if entry.get("live_status") not in (None, "not_live", "was_live"):
+        return False, f"No es un vídeo normal ({entry['live_status']})"
+    return True, ""
+
+
+def pick_format(entry: dict, max_height: int = 1080) -> str | None:
+    """
+    Elige los format_id concretos (vídeo + audio) según el sondeo.
+
+    Mismo criterio que el format/format_sort de la descarga: mayor resolución <= max_height,
+    VP9 preferido a igualdad. Devuelve p.ej. "248+251" o None si no hay datos.
+    """
+    formats = entry.get("formats") or []
+    videos = [f for f in formats
+              if f.get("vcodec") not in (None, "none") and f.get("acodec") in (None, "none")
+              and f.get("height") and f["height"] <= max_height]
+    audios = [f for f in formats if f.get("acodec") not in (None, "none") and f.get("vcodec") in (None, "none")]
+    if not videos or not audios:
+        return None
+    best_v = max(videos, key=lambda f: (f["height"], (f.get("vcodec") or "").startswith("vp9"), f.get("tbr") or 0))
+    best_a = max(audios, key=lambda f: f.get("tbr") or 0)
+    return f"{best_v['format_id']}+{best_a['format_id']}"
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    if len(sys.argv) < 2:
+        print("Uso: python scripts/trailer_probe.py <url>")
+        sys.exit(1)
+    result = probe(sys.argv[1], force=True)
+    print(json.dumps({k: v for k, v in result.items() if k != "formats"}, ensure_ascii=False, indent=2))
+    print("Usable:", is_usable(sys.argv[1]))
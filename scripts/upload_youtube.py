@@ -106,7 +106,8 @@ def main(video_path: str | None = None):
         
         print(f"ℹ️ Buscando vídeo para TMDB ID {tmdb_id} en: {search_dir}")
         cands = sorted(
-            search_dir.glob(f"{tmdb_id}_*.mp4"),
+            # Los borradores (build_short.py --draft) nunca se suben
+            (p for p in search_dir.glob(f"{tmdb_id}_*.mp4") if not p.stem.endswith("_draft")),
             key=lambda p: p.stat().st_mtime,
             reverse=True
         )